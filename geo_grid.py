@@ -0,0 +1,83 @@
+"""
+여러 페이지가 같이 쓰는 위도/경도 균일 격자 인덱스와 haversine 거리.
+(05_공시지가: 주변 필지 검색, 02_관광지: 화면 안 관광지 마커 / 여행 동선 거리 행렬)
+
+- 행을 셀 번호 순으로 정렬해 두고, 셀마다 [start, stop) 구간만 기억합니다.
+- 사각 범위 조회는 격자 행(y)마다 이진 탐색 두 번 + 구간 펼치기(NumPy 연산)로 후보를 모은 뒤
+  후보만 정확한 좌표로 거릅니다. 전체 행을 훑지 않습니다.
+"""
+import numpy as np
+
+EARTH_RADIUS_M = 6_371_000
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """두 좌표(배열이면 브로드캐스트) 사이의 거리 (m)"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def build_grid_index(lat, lon, cell_deg, dtype="float64"):
+    """
+    위도/경도 배열 → 격자 인덱스 (좌표가 NaN인 행은 빠짐, 하나도 없으면 None).
+    반환값의 rows는 원래 행 번호, lat/lon은 같은 순서로 정렬된 사본(dtype)입니다.
+    """
+    lat = np.asarray(lat, dtype="float64")
+    lon = np.asarray(lon, dtype="float64")
+    rows = np.flatnonzero(~(np.isnan(lat) | np.isnan(lon)))
+    if not len(rows):
+        return None
+
+    lat0, lon0 = lat[rows].min(), lon[rows].min()
+    iy = ((lat[rows] - lat0) / cell_deg).astype("int64")
+    ix = ((lon[rows] - lon0) / cell_deg).astype("int64")
+    n_x = int(ix.max()) + 1
+    cell = iy * n_x + ix
+
+    order = np.argsort(cell, kind="stable")
+    cell, rows = cell[order], rows[order]
+    starts = np.r_[0, np.flatnonzero(cell[1:] != cell[:-1]) + 1]
+    return {
+        "cell_deg": cell_deg,
+        "lat0": lat0,
+        "lon0": lon0,
+        "n_x": n_x,
+        "n_y": int(iy.max()) + 1,
+        "cells": cell[starts],
+        "bounds": np.r_[starts, len(cell)],
+        "rows": rows,
+        "lat": lat[rows].astype(dtype),
+        "lon": lon[rows].astype(dtype),
+    }
+
+
+def grid_candidates(index, lat_min, lat_max, lon_min, lon_max):
+    """사각 범위와 겹치는 셀들의 정렬 위치 (후보, 아직 정확한 필터 전)"""
+    cell_deg = index["cell_deg"]
+    y0 = max(int((lat_min - index["lat0"]) // cell_deg), 0)
+    y1 = min(int((lat_max - index["lat0"]) // cell_deg), index["n_y"] - 1)
+    x0 = max(int((lon_min - index["lon0"]) // cell_deg), 0)
+    x1 = min(int((lon_max - index["lon0"]) // cell_deg), index["n_x"] - 1)
+    if y0 > y1 or x0 > x1:
+        return np.array([], dtype="int64")
+
+    # 행(y)마다 연속된 셀 번호 구간 → 이진 탐색으로 정렬 위치 구간
+    row_start = np.arange(y0, y1 + 1) * index["n_x"]
+    lo = np.searchsorted(index["cells"], row_start + x0)
+    hi = np.searchsorted(index["cells"], row_start + x1, side="right")
+    starts, stops = index["bounds"][lo], index["bounds"][hi]
+    keep = stops > starts
+    if not keep.any():
+        return np.array([], dtype="int64")
+    lengths = stops[keep] - starts[keep]
+    offsets = np.repeat(starts[keep] - np.r_[0, np.cumsum(lengths)[:-1]], lengths)
+    return np.arange(lengths.sum()) + offsets
+
+
+def query_bbox(index, lat_min, lat_max, lon_min, lon_max):
+    """사각 범위 안 좌표의 원래 행 번호"""
+    pos = grid_candidates(index, lat_min, lat_max, lon_min, lon_max)
+    lat, lon = index["lat"][pos], index["lon"][pos]
+    pos = pos[(lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)]
+    return index["rows"][pos]
@@ -0,0 +1,126 @@
+"""
+MBTI별 책 / 영화 / 진로 추천 엔진 (00_특성검사, 01_특성별책영화추천 페이지가 같이 씀).
+
+- 추천 항목은 mbti_catalog.csv 한 파일에 있고, 항목마다 4개 지표 점수(E, S, T, J 쪽 성향, -1 ~ 1)가 붙어 있습니다.
+- 카탈로그를 읽을 때 16유형 × 항목 적합도를 행렬곱 한 번으로 계산하고,
+  (유형, 종류, 장르, 시대) 조합마다 상위 TOP_K개 항목 번호를 미리 뽑아 둡니다.
+- 그래서 화면에서 추천받는 건 dict 조회 한 번이고, 카탈로그가 커져도 느려지지 않습니다.
+"""
+from itertools import product
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+CATALOG_CSV = Path(__file__).resolve().parent / "mbti_catalog.csv"
+
+# 조합마다 미리 뽑아 두는 추천 개수
+TOP_K = 10
+
+# 4개 지표 (카탈로그 점수는 첫 글자 쪽이 +)
+AXES = ("EI", "SN", "TF", "JP")
+AXIS_COLS = ["E", "S", "T", "J"]
+
+# 필터에서 '전체'를 뜻하는 값
+ALL = "전체"
+
+# 시대 필터: 이름 → (시작 연도, 끝 연도)
+ERAS = {
+    "~1979년": (-np.inf, 1979),
+    "1980~1999년": (1980, 1999),
+    "2000년~": (2000, np.inf),
+}
+
+# 유형별 한 줄 마무리 (페이지가 다시 실행돼도 새로 만들지 않도록 모듈에 둠)
+CLOSING = {
+    "INTJ": "계획표에 하나만 더 추가할까요?",
+    "INTP": "호기심을 채울 준비 되셨나요?",
+    "ENTJ": "다음 목표는 언제인가요, 리더님?",
+    "ENTP": "아이디어는 많고 시간은 부족하죠—즐겨보세요.",
+    "INFJ": "오늘은 마음의 울림이 필요할지도 몰라요.",
+    "INFP": "감성의 바다로 한 발짝 더 들어가볼까요?",
+    "ENFJ": "누군가의 마음을 따뜻하게 만들어볼 시간이에요.",
+    "ENFP": "즉흥과 열정으로 오늘을 채워보세요!",
+    "ISTJ": "질서와 책임감 속에도 작은 여유를 담아보세요.",
+    "ISFJ": "당신의 배려는 세상을 더 아름답게 만듭니다.",
+    "ESTJ": "리더십과 현실 감각, 오늘도 완벽하시네요.",
+    "ESFJ": "따뜻한 미소로 주위를 환하게 만들어주세요.",
+    "ISTP": "조용히, 그러나 완벽하게 해결하실 거잖아요.",
+    "ISFP": "감성은 언제나 당신의 강점이에요.",
+    "ESTP": "도전과 스릴, 오늘도 멋지게 즐기세요.",
+    "ESFP": "세상은 당신의 무대예요, 빛나세요!",
+}
+
+
+@st.cache_resource(show_spinner=False)
+def load_engine(path, mtime_ns):
+    """
+    카탈로그를 읽어서 추천 인덱스를 만듭니다 (파일 버전마다 한 번).
+
+    반환값:
+      items     항목 dict 목록 (kind, title, genre, year, note, reason, ...)
+      genres    종류 → 장르 목록
+      index     (유형, 종류, 장르, 시대) → 적합도 순 항목 번호 배열 (최대 TOP_K개)
+    """
+    df = pd.read_csv(path)
+    df["genre"] = df["genre"].fillna("").astype(str)
+    df["note"] = df["note"].fillna("").astype(str)
+    df["reason"] = df["reason"].fillna("").astype(str)
+
+    types = ["".join(t) for t in product(*AXES)]
+    T = np.array([[1 if t[k] == axis[0] else -1 for k, axis in enumerate(AXES)] for t in types], dtype="float32")
+    A = df[AXIS_COLS].to_numpy(dtype="float32")
+
+    # 유형 × 항목 적합도 (-1 ~ 1) → 유형마다 전체 순위를 한 번만 정렬
+    scores = T @ A.T / len(AXES)
+    ranking = np.argsort(-scores, axis=1, kind="stable")
+
+    kinds = df["kind"].to_numpy(dtype=object)
+    genre = df["genre"].to_numpy(dtype=object)
+    year = pd.to_numeric(df["year"], errors="coerce").to_numpy(dtype=float)
+
+    genres = {}
+    index = {}
+    for kind in pd.unique(kinds):
+        kind_mask = kinds == kind
+        genres[kind] = sorted(g for g in pd.unique(genre[kind_mask]) if g)
+        for g in [ALL] + genres[kind]:
+            genre_mask = kind_mask if g == ALL else kind_mask & (genre == g)
+            for era, bounds in [(ALL, None)] + list(ERAS.items()):
+                mask = genre_mask
+                if bounds is not None:
+                    mask = mask & (year >= bounds[0]) & (year <= bounds[1])
+                n = int(mask.sum())
+                if n == 0:
+                    continue
+                # 조건은 모든 유형에 같으므로 유형마다 남는 개수도 같음 → 한 번에 잘라냄
+                top = ranking[mask[ranking]].reshape(len(types), n)[:, :TOP_K]
+                for r, t in enumerate(types):
+                    index[(t, kind, g, era)] = top[r]
+
+    return {
+        "items": df.drop(columns=AXIS_COLS).to_dict("records"),
+        "genres": genres,
+        "index": index,
+    }
+
+
+def engine():
+    """현재 카탈로그 파일 버전의 추천 엔진"""
+    return load_engine(str(CATALOG_CSV), CATALOG_CSV.stat().st_mtime_ns)
+
+
+def genres_of(kind):
+    """종류(book / movie / career)의 장르 목록"""
+    return engine()["genres"].get(kind, [])
+
+
+def recommend(mbti, kind, k=2, genre=ALL, era=ALL):
+    """
+    MBTI 유형에 맞는 kind 항목을 적합도 순으로 최대 k개 (k <= TOP_K).
+    미리 뽑아 둔 목록을 꺼내기만 하므로 카탈로그 크기와 상관없이 빠릅니다.
+    """
+    eng = engine()
+    ids = eng["index"].get((mbti, kind, genre, era), ())
+    return [eng["items"][j] for j in ids[:k]]
@@ -1,8 +1,14 @@
 # app.py
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
 import streamlit as st
 from streamlit_folium import st_folium
 import folium
-from folium.plugins import MarkerCluster
+from folium.plugins import FastMarkerCluster
+
+from geo_grid import build_grid_index, haversine_m, query_bbox
 
 st.set_page_config(page_title="Seoul Top10 (for foreign visitors)", layout="wide")
 st.title("🇰🇷 외국인들이 좋아하는 서울 주요 관광지 Top 10")
@@ -12,73 +18,317 @@ st.markdown(
     "마커를 클릭하면 해당 관광지의 간단한 설명이 아래에 표시됩니다."
 )
 
-# 관광지 데이터
-PLACES = [
-    ("Gyeongbokgung Palace (경복궁)", 37.5796, 126.9770,
-     "조선의 대표 궁궐로, 화려한 근정전과 수문장 교대식이 인기입니다."),
-    ("Changdeokgung Palace & Secret Garden (창덕궁·비원)", 37.5794, 126.9910,
-     "유네스코 문화유산으로 등록된 고궁. 자연과 조화를 이룬 비원이 유명합니다."),
-    ("N Seoul Tower (남산타워)", 37.5512, 126.9882,
-     "서울의 랜드마크 전망대. 야경 명소이자 사랑의 자물쇠로 유명합니다."),
-    ("Myeongdong (명동)", 37.5609, 126.9861,
-     "서울의 대표 쇼핑 거리로, 화장품·패션·길거리 음식이 인기를 끕니다."),
-    ("Bukchon Hanok Village (북촌한옥마을)", 37.5826, 126.9830,
-     "조선시대 양반가의 한옥이 모여 있는 전통마을로, 사진 명소입니다."),
-    ("Insadong (인사동)", 37.5740, 126.9849,
-     "전통 공예품과 찻집, 갤러리들이 모여 있어 한국 문화의 정취를 느낄 수 있습니다."),
-    ("Hongdae (홍대)", 37.5576, 126.9251,
-     "젊음의 거리로, 거리공연과 카페·클럽 문화가 활발합니다."),
-    ("Dongdaemun Design Plaza (DDP)", 37.5663, 127.0090,
-     "자하 하디드의 미래적 건축물로, 야경과 전시회로 인기입니다."),
-    ("Gwangjang Market (광장시장)", 37.5704, 126.9990,
-     "100년 전통의 시장으로, 빈대떡·마약김밥 등 한국 길거리 음식 천국입니다."),
-    ("Cheonggyecheon Stream (청계천)", 37.5660, 126.9770,
-     "도심 속 복원된 하천 산책로로, 낮에는 산책, 밤에는 조명이 아름답습니다.")
-]
-
-# 지도 초기화
-m = folium.Map(location=[37.5665, 126.9780], zoom_start=12)
-mc = MarkerCluster().add_to(m)
-
-# folium 마커 생성
-for name, lat, lon, desc in PLACES:
-    folium.Marker(
-        location=[lat, lon],
-        popup=name,  # 간단한 이름만 표시
-        tooltip=name,
-        icon=folium.Icon(color="blue", icon="info-sign")
-    ).add_to(mc)
-
-# 지도 표시 (70% 크기 정도)
-col1, col2, col3 = st.columns([0.15, 0.7, 0.15])
-with col2:
-    st_folium_output = st_folium(m, width=900, height=500)
-
-# 마커 클릭 감지
-clicked_info = st_folium_output.get("last_object_clicked_popup")
-
-# 클릭된 관광지 설명 표시
-if clicked_info:
-    selected_name = clicked_info
-    for name, lat, lon, desc in PLACES:
-        if name == selected_name:
-            st.markdown(f"### 📍 {name}")
-            st.write(desc)
-            st.markdown(
-                f"[🔎 Google에서 더 보기](https://www.google.com/search?q={name.replace(' ', '+')})"
-            )
-            break
-else:
-    st.info("지도의 마커를 클릭하면 관광지 설명이 여기에 표시됩니다 😊")
+# 관광지 데이터 (pages 폴더 기준)
+# 컬럼: rank(Top10 순위, 나머지는 비움), name, lat, lon, desc
+PLACES_CSV = Path(__file__).resolve().parent / "seoul_places.csv"
+
+MAP_CENTER = (37.5665, 126.9780)
+MAP_ZOOM = 12
+MAP_WIDTH, MAP_HEIGHT = 900, 500
+
+# 공간 격자 셀 크기 (약 1km) / 한 번에 브라우저로 보내는 최대 마커 수
+GRID_DEG = 0.01
+MAX_MARKERS = 5000
+
+
+@st.cache_data(show_spinner=False)
+def load_places(path, mtime_ns):
+    df = pd.read_csv(path, encoding="utf-8")
+    df["desc"] = df["desc"].fillna("")
+    return df.dropna(subset=["name", "lat", "lon"]).reset_index(drop=True)
+
+
+@st.cache_resource(show_spinner=False)
+def build_place_index(path, mtime_ns):
+    """관광지 이름 → 행 번호, 위도/경도 균일 격자 인덱스 (geo_grid 공통 모듈)"""
+    places = load_places(path, mtime_ns)
+    return {
+        "by_name": {name: i for i, name in enumerate(places["name"])},
+        "grid": build_grid_index(places["lat"].to_numpy(), places["lon"].to_numpy(), GRID_DEG),
+    }
+
+
+def places_in_view(index, south, west, north, east):
+    """화면 범위 안 관광지의 행 번호 (격자 셀 구간만 보고 정확히 필터)"""
+    if index["grid"] is None:
+        return np.array([], dtype="int64")
+    return np.sort(query_bbox(index["grid"], south, north, west, east))
+
+
+def view_from_bounds(bounds):
+    """st_folium bounds → (남, 서, 북, 동), 아직 없으면 None"""
+    sw, ne = (bounds or {}).get("_southWest") or {}, (bounds or {}).get("_northEast") or {}
+    if sw.get("lat") is None or ne.get("lat") is None:
+        return None
+    return sw["lat"], sw["lng"], ne["lat"], ne["lng"]
+
+
+def default_view():
+    """첫 화면(중심 + 줌)의 대략적인 범위 (웹 메르카토르 기준)"""
+    span_lon = MAP_WIDTH / 256 * 360 / 2 ** MAP_ZOOM
+    span_lat = MAP_HEIGHT / 256 * 360 / 2 ** MAP_ZOOM * np.cos(np.radians(MAP_CENTER[0]))
+    return (MAP_CENTER[0] - span_lat / 2, MAP_CENTER[1] - span_lon / 2,
+            MAP_CENTER[0] + span_lat / 2, MAP_CENTER[1] + span_lon / 2)
+
+
+@st.cache_data(show_spinner=False)
+def build_base_map():
+    """
+    마커 없는 기본 지도는 한 번만 만듭니다.
+    cache_data는 직렬화(pickle)된 지도를 보관했다가 매번 같은 복사본을 돌려주므로
+    지도 컴포넌트가 다시 로드되지 않고, 마커 레이어만 바뀝니다.
+    """
+    return folium.Map(location=list(MAP_CENTER), zoom_start=MAP_ZOOM)
+
+
+# 마커는 브라우저에서 만듦 (FastMarkerCluster) — 클릭하면 팝업의 이름이 돌려받아짐
+MARKER_CALLBACK = """
+function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    var popup = document.createElement("div");
+    popup.innerText = row[2];
+    marker.bindPopup(popup);
+    marker.bindTooltip(row[2]);
+    return marker;
+};
+"""
+
+
+def marker_layer(places, rows):
+    layer = folium.FeatureGroup(name="관광지")
+    data = places.loc[rows, ["lat", "lon", "name"]].values.tolist()
+    FastMarkerCluster(data, callback=MARKER_CALLBACK).add_to(layer)
+    return layer
+
+
+# ---------------------------
+# 여행 동선 (거리 행렬 + 방문 순서 최적화)
+# ---------------------------
+# 이 개수까지는 비트마스크 DP로 정확한 최적해, 넘으면 2-opt 근사
+EXACT_LIMIT = 16
+
+
+def distance_matrix(lat, lon):
+    """haversine 거리 행렬 (km) — 브로드캐스트 한 번"""
+    return haversine_m(lat[:, None], lon[:, None], lat[None, :], lon[None, :]) / 1000
+
+
+def route_length(dist, route, round_trip):
+    route = list(route) + ([route[0]] if round_trip else [])
+    return float(dist[route[:-1], route[1:]].sum())
+
+
+def solve_exact(dist, round_trip):
+    """
+    0번에서 출발해 모두 방문하는 최단 순서 (Held-Karp 비트마스크 DP).
+    방문한 개수(popcount)가 같은 mask들을 한 층으로 묶어서, 층마다 (mask × 마지막 × 다음)을 한 번에 계산합니다.
+    """
+    n = len(dist)
+    full = (1 << n) - 1
+    dp = np.full((1 << n, n), np.inf)
+    dp[1, 0] = 0.0
+
+    masks = np.arange(1 << n)
+    popcount = np.zeros(1 << n, dtype="int64")
+    for j in range(n):
+        popcount += (masks >> j) & 1
+    bits = 1 << np.arange(n)
+
+    for size in range(1, n):
+        layer = masks[(popcount == size) & (masks & 1 == 1)]
+        # cost[m, k, j] = dp[mask, k] + dist[k, j]
+        cost = dp[layer][:, :, None] + dist[None, :, :]
+        best = cost.min(axis=1)
+        for j in range(1, n):
+            free = (layer & bits[j]) == 0
+            targets = layer[free] | bits[j]
+            np.minimum.at(dp[:, j], targets, best[free, j])
+
+    end_cost = dp[full] + (dist[:, 0] if round_trip else 0.0)
+    last = int(np.argmin(end_cost))
+
+    # 역추적: dp[mask, j] = dp[mask ^ j, k] + dist[k, j] 인 k를 다시 찾음
+    route, mask = [last], full
+    while mask != 1:
+        prev_mask = mask ^ (1 << last)
+        k = int(np.argmin(dp[prev_mask] + dist[:, last]))
+        route.append(k)
+        mask, last = prev_mask, k
+    return route[::-1]
+
+
+def solve_two_opt(dist, round_trip):
+    """가까운 곳부터 방문한 순서를 2-opt로 개선 (0번 출발 고정)"""
+    n = len(dist)
+    route, left = [0], set(range(1, n))
+    while left:
+        nxt = min(left, key=lambda j: dist[route[-1], j])
+        route.append(nxt)
+        left.remove(nxt)
+    route = np.array(route)
+
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n - 1):
+            # 구간 route[i..j]를 뒤집을 때의 길이 변화 (j는 한 번에 벡터로)
+            j = np.arange(i + 1, n)
+            a, b, c = route[i - 1], route[i], route[j]
+            if round_trip:
+                e = route[(j + 1) % n]
+                delta = dist[a, c] + dist[b, e] - dist[a, b] - dist[c, e]
+            else:
+                e = route[np.minimum(j + 1, n - 1)]
+                tail = np.where(j + 1 < n, dist[b, e] - dist[c, e], 0.0)
+                delta = dist[a, c] - dist[a, b] + tail
+            k = int(np.argmin(delta))
+            if delta[k] < -1e-9:
+                route[i:j[k] + 1] = route[i:j[k] + 1][::-1].copy()
+                improved = True
+    return route.tolist()
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def plan_route(points, round_trip):
+    """
+    points: ((이름, 위도, 경도), ...) — 첫 번째가 출발지.
+    선택 조합별로 결과를 기억하므로 같은 조합을 다시 고르면 바로 나옵니다.
+    반환값: (방문 순서 인덱스, 총 거리 km, 구간 거리 km 목록, 정확한 최적해 여부)
+    """
+    lat = np.array([p[1] for p in points], dtype="float64")
+    lon = np.array([p[2] for p in points], dtype="float64")
+    dist = distance_matrix(lat, lon)
+    if len(points) <= 2:
+        route = list(range(len(points)))
+        exact = True
+    elif len(points) <= EXACT_LIMIT:
+        route, exact = solve_exact(dist, round_trip), True
+    else:
+        route, exact = solve_two_opt(dist, round_trip), False
+
+    stops = route + ([route[0]] if round_trip else [])
+    legs = [float(dist[a, b]) for a, b in zip(stops[:-1], stops[1:])]
+    return route, route_length(dist, route, round_trip), legs, exact
+
+
+@st.cache_data(show_spinner=False)
+def build_route_map(points, route, round_trip):
+    m = folium.Map(location=list(MAP_CENTER), zoom_start=MAP_ZOOM)
+    path = [points[i][1:] for i in route] + ([points[route[0]][1:]] if round_trip else [])
+    folium.PolyLine(path, color="red", weight=4, opacity=0.8).add_to(m)
+    for order, i in enumerate(route, 1):
+        name, lat, lon = points[i]
+        folium.Marker(
+            location=[lat, lon],
+            tooltip=f"{order}. {name}",
+            icon=folium.DivIcon(html=(
+                '<div style="background:#d62728;color:white;border-radius:50%;width:24px;height:24px;'
+                f'text-align:center;line-height:24px;font-weight:bold;">{order}</div>'
+            )),
+        ).add_to(m)
+    m.fit_bounds([[min(p[0] for p in path), min(p[1] for p in path)],
+                  [max(p[0] for p in path), max(p[1] for p in path)]])
+    return m
+
+
+places_mtime = PLACES_CSV.stat().st_mtime_ns
+places = load_places(str(PLACES_CSV), places_mtime)
+place_index = build_place_index(str(PLACES_CSV), places_mtime)
+
+
+# 클릭/지도 이동하면 이 fragment만 다시 실행 (아래 요약 목록은 그대로)
+@st.fragment
+def render_map_panel():
+    # 브라우저가 마지막으로 알려준 화면 범위 안의 관광지만 보냄
+    # (st_folium은 key가 있으면 지도 상태를 session_state[key]에 넣어 줌)
+    view = view_from_bounds((st.session_state.get("seoul_map") or {}).get("bounds")) or default_view()
+    rows = places_in_view(place_index, *view)
+    if len(rows) > MAX_MARKERS:
+        rows = rows[:MAX_MARKERS]
+        st.caption(f"화면 안 관광지가 많아서 {MAX_MARKERS:,}곳만 표시합니다. 지도를 확대해 보세요.")
+
+    # 지도 표시 (70% 크기 정도)
+    col1, col2, col3 = st.columns([0.15, 0.7, 0.15])
+    with col2:
+        st_folium_output = st_folium(
+            build_base_map(),
+            key="seoul_map",
+            width=MAP_WIDTH,
+            height=MAP_HEIGHT,
+            feature_group_to_add=marker_layer(places, rows),
+            returned_objects=["last_object_clicked_popup", "bounds"],
+        )
+
+    # 마커 클릭 감지 → 이름 인덱스 lookup
+    clicked_info = (st_folium_output or {}).get("last_object_clicked_popup")
+    i = place_index["by_name"].get(clicked_info)
+
+    # 클릭된 관광지 설명 표시
+    if i is not None:
+        name, desc = places.at[i, "name"], places.at[i, "desc"]
+        st.markdown(f"### 📍 {name}")
+        st.write(desc)
+        st.markdown(
+            f"[🔎 Google에서 더 보기](https://www.google.com/search?q={name.replace(' ', '+')})"
+        )
+    else:
+        st.info("지도의 마커를 클릭하면 관광지 설명이 여기에 표시됩니다 😊")
+
+
+render_map_panel()
 
 st.markdown("---")
 
 # 지도 아래 관광지 요약
 st.subheader("🗺️ 서울 Top10 관광지 요약")
 
+top10 = places.dropna(subset=["rank"]).sort_values("rank").head(10)
 cols = st.columns(2)
-for i, (name, lat, lon, desc) in enumerate(PLACES):
+for i, row in enumerate(top10.itertuples()):
     with cols[i % 2]:
-        st.markdown(f"**{i+1}. {name}**")
-        st.write(f"📍 위도 {lat:.4f}, 경도 {lon:.4f}")
-        st.caption(desc)
+        st.markdown(f"**{i+1}. {row.name}**")
+        st.write(f"📍 위도 {row.lat:.4f}, 경도 {row.lon:.4f}")
+        st.caption(row.desc)
+
+st.markdown("---")
+
+# 여행 동선 짜기
+st.subheader("🧭 여행 동선 짜기")
+st.caption(f"{EXACT_LIMIT}곳 이하는 가장 짧은 순서를 정확히 계산하고, 그보다 많으면 2-opt로 가깝게 찾습니다.")
+
+selected = st.multiselect(
+    "방문할 관광지 (첫 번째가 출발지)",
+    places["name"].tolist(),
+    default=top10["name"].head(5).tolist(),
+)
+round_trip = st.checkbox("출발지로 돌아오기", value=False)
+
+if len(selected) >= 2:
+    rows = [place_index["by_name"][name] for name in selected]
+    points = tuple(zip(selected, places["lat"].to_numpy()[rows].tolist(), places["lon"].to_numpy()[rows].tolist()))
+    route, total_km, legs, exact = plan_route(points, round_trip)
+
+    r1, r2 = st.columns([1, 2])
+    with r1:
+        st.metric("총 이동 거리", f"{total_km:.2f} km", help="직선(haversine) 거리 기준")
+        st.caption("최적 순서" if exact else "근사 순서 (2-opt)")
+        stops = route + ([route[0]] if round_trip else [])
+        st.dataframe(
+            pd.DataFrame({
+                "순서": range(1, len(stops) + 1),
+                "관광지": [points[i][0] for i in stops],
+                "이전 지점에서 (km)": [0.0] + [round(leg, 2) for leg in legs],
+            }),
+            hide_index=True,
+            use_container_width=True,
+        )
+    with r2:
+        st_folium(
+            build_route_map(points, tuple(route), round_trip),
+            key="route_map",
+            width=MAP_WIDTH,
+            height=450,
+            returned_objects=[],
+        )
+else:
+    st.info("관광지를 2곳 이상 고르면 방문 순서를 계산합니다.")
@@ -1,74 +1,728 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from pathlib import Path
+
 import streamlit as st
+import numpy as np
 import pandas as pd
-import plotly.express as px
+import plotly.graph_objects as go
+import pyarrow.feather as feather
+
+from ranked_bar import ranked_bar_chart
 
 st.set_page_config(page_title="지하철 승하차 Top10", layout="wide")
-st.title("🚇 2025년 10월 지하철 승하차 Top10 분석")
+st.title("🚇 지하철 승하차 Top10 분석")
 
 # ===========================================================
 # 데이터 불러오기 (pages 폴더 기준)
 # ===========================================================
-@st.cache_data
+BASE_DIR = Path(__file__).resolve().parent
+SOURCE_CSV = BASE_DIR / "subway.csv"
+CACHE_DIR = BASE_DIR / ".cache"
+ARTIFACT_PATH = CACHE_DIR / "subway.arrow"
+META_PATH = CACHE_DIR / "subway.json"
+
+# 컬럼 구성/타입이 바뀌면 올려서 기존 캐시를 무효화
+ARTIFACT_VERSION = 1
+
+# 원본 CSV 헤더 → 내부 컬럼명
+COLUMN_MAP = {
+    "사용일자": "date",
+    "노선명": "line",
+    "역명": "station",
+    "승차총승객수": "on",
+    "하차총승객수": "off",
+}
+
+
+def _file_sha1(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _read_source_csv(path):
+    """
+    원본 CSV를 한 번 파싱해서 타입이 지정된 DataFrame으로 만듭니다.
+    (노선명/역명 → category, 승차/하차 → int32, 사용일자 → datetime)
+    """
+    try:
+        df = pd.read_csv(path, encoding="utf-8")
+    except UnicodeDecodeError:
+        # 공공데이터 포털 원본은 cp949
+        if hasattr(path, "seek"):
+            path.seek(0)
+        df = pd.read_csv(path, encoding="cp949")
+    missing = [col for col in COLUMN_MAP if col not in df.columns]
+    if missing:
+        raise ValueError("필요한 컬럼이 없습니다: " + ", ".join(missing))
+    df = df.rename(columns=COLUMN_MAP)[list(COLUMN_MAP.values())]
+
+    if pd.api.types.is_integer_dtype(df["date"]):
+        # 20251001 형태 → 형식을 지정해서 한 번에 변환
+        df["date"] = pd.to_datetime(df["date"].astype(str), format="%Y%m%d")
+    else:
+        df["date"] = pd.to_datetime(df["date"])
+    df["line"] = df["line"].astype("category")
+    df["station"] = df["station"].astype("category")
+    for col in ["on", "off"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype("int32")
+
+    return df.sort_values("date", kind="stable").reset_index(drop=True)
+
+
+def _write_artifact(df, meta):
+    CACHE_DIR.mkdir(exist_ok=True)
+    tmp_path = ARTIFACT_PATH.with_suffix(".tmp")
+    # 압축하지 않은 Arrow IPC 파일이어야 memory map으로 바로 읽을 수 있음
+    feather.write_feather(df, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, ARTIFACT_PATH)
+    META_PATH.write_text(json.dumps(meta), encoding="utf-8")
+
+
+def _read_meta():
+    try:
+        return json.loads(META_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+@st.cache_resource(show_spinner="지하철 데이터를 준비하는 중...")
+def _load_table(source, mtime_ns, size):
+    """
+    원본 파일의 (mtime, size)가 같으면 캐시된 Arrow 파일을 memory map으로 엽니다.
+    mtime만 바뀌고 내용(sha1)이 같으면 메타만 갱신하고, 내용이 바뀌었으면 다시 빌드합니다.
+    """
+    meta = _read_meta()
+    fresh = (
+        ARTIFACT_PATH.exists()
+        and meta.get("version") == ARTIFACT_VERSION
+        and meta.get("source") == source
+    )
+    if fresh and (meta.get("mtime_ns"), meta.get("size")) != (mtime_ns, size):
+        sha1 = _file_sha1(source)
+        fresh = meta.get("sha1") == sha1
+        if fresh:
+            meta.update(mtime_ns=mtime_ns, size=size)
+            META_PATH.write_text(json.dumps(meta), encoding="utf-8")
+
+    if not fresh:
+        df = _read_source_csv(source)
+        _write_artifact(df, {
+            "version": ARTIFACT_VERSION,
+            "source": source,
+            "mtime_ns": mtime_ns,
+            "size": size,
+            "sha1": _file_sha1(source),
+        })
+
+    # 숫자/날짜 컬럼은 복사 없이 mmap 버퍼를 그대로 사용 (split_blocks)
+    table = feather.read_table(ARTIFACT_PATH, memory_map=True)
+    return table.to_pandas(split_blocks=True)
+
+
+def source_version():
+    stat = SOURCE_CSV.stat()
+    return str(SOURCE_CSV), stat.st_mtime_ns, stat.st_size
+
+
 def load_data():
-    df = pd.read_csv("subway.csv", encoding="utf-8")
-    return df
+    return _load_table(*source_version())
+
+
+# ===========================================================
+# 날짜 파티션 저장소 (일별 추가 적재)
+# ===========================================================
+# .subway_store/
+#   source.json              마지막으로 반영한 원본 subway.csv (경로, mtime, 크기)
+#   manifest/2025-10.json    그 달의 날짜별 파티션 경로, 호선별 순위 구간, 호선별 합계
+#   manifest/VERSION         적재할 때마다 갱신 (mtime = 저장소 버전)
+#   2025-10/20251001.arrow   하루치 행 (호선, 승하차 합계 내림차순 정렬)
+#
+# manifest를 월 단위로 나눠 두어 하루치를 추가해도 그 달 파일만 다시 씁니다.
+STORE_DIR = BASE_DIR / ".subway_store"
+SOURCE_STAMP_PATH = STORE_DIR / "source.json"
+MANIFEST_DIR = STORE_DIR / "manifest"
+MANIFEST_STAMP_PATH = MANIFEST_DIR / "VERSION"
+STORE_VERSION = 2
+
+TOP_N = 10
+
+
+def _read_json(path):
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != STORE_VERSION:
+        return None
+    return data
+
+
+def _write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps({"version": STORE_VERSION, **data}, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def _read_month(month):
+    """한 달치 manifest (YYYY-MM) → {날짜: 항목}"""
+    data = _read_json(MANIFEST_DIR / f"{month}.json")
+    return data["days"] if data else {}
+
+
+def manifest_version():
+    """저장소 버전 (아직 아무것도 적재하지 않았으면 0)"""
+    try:
+        return MANIFEST_STAMP_PATH.stat().st_mtime_ns
+    except OSError:
+        return 0
+
+
+@st.cache_resource(show_spinner=False)
+def read_manifest(version):
+    """
+    월별 manifest를 합친 {"days": {날짜: 항목}} (저장소 버전마다 한 번만 읽음).
+    여러 곳에서 같이 쓰는 객체이므로 수정하지 않습니다.
+    """
+    days = {}
+    for path in sorted(MANIFEST_DIR.glob("*.json")):
+        days.update(_read_month(path.stem))
+    return {"days": days}
+
+
+def _build_partition(part):
+    """
+    하루치 행을 (호선, 합계 내림차순)으로 정렬하고
+    호선별 [start, stop) 순위 구간과 승차/하차 합계를 계산합니다.
+    """
+    part = part.assign(
+        line=part["line"].astype(str),
+        station=part["station"].astype(str),
+        total=part["on"].astype("int64") + part["off"],
+    )
+    part = part.sort_values(["line", "total"], ascending=[True, False], kind="stable")
+    part = part.reset_index(drop=True)
+
+    # 호선이 바뀌는 위치 = 순위 구간 경계
+    line_values = part["line"].to_numpy()
+    change = np.flatnonzero(line_values[1:] != line_values[:-1]) + 1
+    starts = np.r_[0, change]
+    stops = np.r_[change, len(part)]
+    on_sums = np.add.reduceat(part["on"].to_numpy(dtype="int64"), starts)
+    off_sums = np.add.reduceat(part["off"].to_numpy(dtype="int64"), starts)
+
+    lines = {}
+    for start, stop, on_sum, off_sum in zip(starts, stops, on_sums, off_sums):
+        lines[line_values[start]] = [int(start), int(stop), int(on_sum), int(off_sum)]
+
+    content = pd.util.hash_pandas_object(part[["line", "station", "on", "off"]], index=False)
+    part["line"] = part["line"].astype("category")
+    part["station"] = part["station"].astype("category")
+    return part, lines, hashlib.sha1(content.to_numpy().tobytes()).hexdigest()
+
+
+def ingest(new_df, overwrite=False, source=None):
+    """
+    새 행들을 날짜 파티션으로 나눠 저장소에 추가합니다.
+    새로 들어온 날짜의 파티션만 정렬/집계하므로 비용은 추가분 크기에 비례합니다.
+
+    반환값: {"added", "replaced", "duplicate", "conflict", "dup_rows"}
+      - duplicate: 이미 같은 내용으로 적재된 날짜 (건너뜀)
+      - conflict : 이미 있지만 내용이 다른 날짜 (overwrite=True일 때만 교체)
+    """
+    result = {"added": [], "replaced": [], "duplicate": [], "conflict": [], "dup_rows": 0}
+    months = {}  # 이번에 건드린 달만 읽고 다시 씀
+
+    # 같은 파일 안의 중복 행 (같은 날짜/호선/역) → 마지막 값 사용
+    dup_mask = new_df.duplicated(["date", "line", "station"], keep="last")
+    result["dup_rows"] = int(dup_mask.sum())
+    new_df = new_df[~dup_mask]
+
+    for date, part in new_df.groupby("date", sort=True):
+        day = date.strftime("%Y-%m-%d")
+        part, lines, content_hash = _build_partition(part)
+
+        month_days = months.setdefault(day[:7], _read_month(day[:7]))
+        entry = month_days.get(day)
+        if entry is not None:
+            if entry["hash"] == content_hash:
+                result["duplicate"].append(day)
+                continue
+            if not overwrite:
+                result["conflict"].append(day)
+                continue
+
+        rel_path = f"{day[:7]}/{day.replace('-', '')}.arrow"
+        path = STORE_DIR / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        feather.write_feather(part, tmp_path, compression="uncompressed")
+        os.replace(tmp_path, path)
+
+        month_days[day] = {
+            "path": rel_path,
+            "rows": len(part),
+            "hash": content_hash,
+            "lines": lines,
+        }
+        result["replaced" if entry is not None else "added"].append(day)
+
+    changed = {day[:7] for day in result["added"] + result["replaced"]}
+    for month in sorted(changed):
+        _write_json(MANIFEST_DIR / f"{month}.json", {"days": months[month]})
+    if changed or not MANIFEST_STAMP_PATH.exists():
+        _write_json(MANIFEST_STAMP_PATH, {})
+    if source is not None:
+        _write_json(SOURCE_STAMP_PATH, {"source": source})
+    return result
+
+
+def _migrate_v1():
+    """예전 저장소(manifest.json 한 파일)를 월별 manifest로 한 번만 옮깁니다 (업로드한 날짜 유지)"""
+    old_path = STORE_DIR / "manifest.json"
+    if MANIFEST_STAMP_PATH.exists() or not old_path.exists():
+        return
+    try:
+        old = json.loads(old_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return
+    if old.get("version") != 1:
+        return
+    months = {}
+    for day, entry in old.get("days", {}).items():
+        months.setdefault(day[:7], {})[day] = entry
+    for month, month_days in months.items():
+        _write_json(MANIFEST_DIR / f"{month}.json", {"days": month_days})
+    if old.get("source"):
+        _write_json(SOURCE_STAMP_PATH, {"source": old["source"]})
+    _write_json(MANIFEST_STAMP_PATH, {})
+    old_path.unlink()
+
+
+def sync_source():
+    """원본 subway.csv가 바뀌었을 때만 저장소에 반영 (원본에 있는 날짜는 원본 내용이 우선)"""
+    _migrate_v1()
+    source = list(source_version())
+    stamp = _read_json(SOURCE_STAMP_PATH)
+    if stamp is None or stamp.get("source") != source:
+        ingest(load_data(), overwrite=True, source=source)
+
+
+@st.cache_resource(show_spinner=False)
+def load_index(version):
+    """
+    manifest → (날짜, 호선) 순위 인덱스.
+    파티션 데이터는 읽지 않고 메타데이터만 펼치므로 행 수와 무관하게 가볍습니다.
+    """
+    manifest = read_manifest(version)
+    rank_index = {}
+    for day, entry in manifest["days"].items():
+        for line, (start, stop, on_sum, off_sum) in entry["lines"].items():
+            rank_index[(day, line)] = (entry["path"], entry["hash"], start, stop, on_sum, off_sum)
+
+    days = np.array(sorted(manifest["days"]), dtype="datetime64[D]")
+    lines = sorted({line for _, line in rank_index})
+    return rank_index, days, lines
 
-df = load_data()
 
-# 날짜 처리
-df["date"] = pd.to_datetime(df["date"])
+@st.cache_resource(show_spinner=False, max_entries=256)
+def open_partition(rel_path, content_hash):
+    """하루치 파티션을 memory map으로 엽니다 (실제 읽기는 슬라이스한 행만)"""
+    return feather.read_table(STORE_DIR / rel_path, memory_map=True)
 
-# 2025년 10월만 필터링
-df_oct = df[df["date"].dt.strftime("%Y-%m") == "2025-10"]
+
+def month_bounds(days, month):
+    """정렬된 날짜 배열에서 해당 월(YYYY-MM)의 [lo, hi) 범위 (이진 탐색)"""
+    start = np.datetime64(month, "M")
+    return np.searchsorted(days, [start, start + 1])
+
+
+def scan(rank_index, days, date_from, date_to, line, columns=("station", "on", "off")):
+    """
+    [date_from, date_to] 기간 / 해당 호선의 행만 월 단위로 읽어 옵니다.
+      - 날짜 조건: 정렬된 날짜 배열의 searchsorted → 범위 밖 파티션은 열지 않음
+      - 호선 조건: 파티션이 호선순으로 정렬되어 있어 [start, stop) 구간만 슬라이스
+    한 번에 메모리에 올라가는 것은 한 달치 × 한 호선뿐입니다.
+    """
+    lo = np.searchsorted(days, np.datetime64(date_from, "D"), side="left")
+    hi = np.searchsorted(days, np.datetime64(date_to, "D"), side="right")
+    selected = days[lo:hi]
+    months = selected.astype("datetime64[M]")
+    for month in np.unique(months):
+        chunks = []
+        for day in selected[months == month]:
+            entry = rank_index.get((str(day), line))
+            if entry is None:
+                continue
+            rel_path, content_hash, start, stop = entry[:4]
+            table = open_partition(rel_path, content_hash).slice(start, stop - start)
+            chunks.append(table.select(list(columns)).to_pandas())
+        if chunks:
+            yield str(month), pd.concat(chunks, ignore_index=True)
+
+
+def range_top_n(rank_index, days, date_from, date_to, line, n=TOP_N):
+    """기간 합계 Top N: 월별 부분 합계를 누적해서 메모리 사용량을 한 달치로 제한"""
+    partial = None
+    for _, chunk in scan(rank_index, days, date_from, date_to, line):
+        chunk["station"] = chunk["station"].astype(str)
+        sums = chunk.groupby("station")[["on", "off"]].sum()
+        partial = sums if partial is None else partial.add(sums, fill_value=0)
+
+    if partial is None:
+        return pd.DataFrame(columns=["station", "on", "off", "total"])
+    partial = partial.astype("int64")
+    partial["total"] = partial["on"] + partial["off"]
+    return partial.sort_values("total", ascending=False).head(n).reset_index()
+
+# ===========================================================
+# 역 × 날짜 행렬 (역별 추이 / 이상치 분석용)
+# ===========================================================
+@st.cache_resource(show_spinner=False)
+def _station_daily_cache():
+    # 날짜별 (content hash, 역 코드, 승차, 하차) — 새로 적재/교체된 날짜만 다시 읽음
+    return {"lock": threading.Lock(), "codes": {}, "per_day": {}}
+
+
+@st.cache_resource(show_spinner="역별 일 합계를 준비하는 중...")
+def station_matrix(version):
+    """
+    역(호선 합산) × 날짜 승차/하차 행렬을 만듭니다.
+    값이 없는 날은 NaN이므로 float32를 사용합니다 (역별 일 승객 수는 float32로 정확히 표현됨).
+    반환값: (역 이름 배열, 날짜 배열, 승차 행렬, 하차 행렬)
+    """
+    cache = _station_daily_cache()
+    manifest = read_manifest(version)
+
+    with cache["lock"]:
+        codes, per_day = cache["codes"], cache["per_day"]
+        for day in set(per_day) - set(manifest["days"]):
+            del per_day[day]
+
+        for day, entry in manifest["days"].items():
+            if day in per_day and per_day[day][0] == entry["hash"]:
+                continue
+            part = open_partition(entry["path"], entry["hash"]).select(["station", "on", "off"]).to_pandas()
+            # 같은 이름의 역이 여러 호선에 있으면 합산
+            sums = part.groupby(part["station"].astype(str))[["on", "off"]].sum()
+            day_codes = np.array([codes.setdefault(name, len(codes)) for name in sums.index])
+            per_day[day] = (entry["hash"], day_codes, sums["on"].to_numpy(), sums["off"].to_numpy())
+
+        days = sorted(per_day)
+        on = np.full((len(codes), len(days)), np.nan, dtype="float32")
+        off = np.full((len(codes), len(days)), np.nan, dtype="float32")
+        for col, day in enumerate(days):
+            _, day_codes, on_values, off_values = per_day[day]
+            on[day_codes, col] = on_values
+            off[day_codes, col] = off_values
+        stations = np.array(list(codes), dtype=object)
+
+    return stations, np.array(days, dtype="datetime64[D]"), on, off
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets 다운샘플링.
+    모양(피크/골)을 보존하면서 n_out개 점의 인덱스를 고릅니다.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # 첫/마지막 점은 고정, 나머지를 n_out - 2개 버킷으로 나눔
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo = edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        # 이전 선택점 a, 현재 버킷 후보, 다음 버킷 평균이 이루는 삼각형 넓이가 최대인 점
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+# ===========================================================
+# 이상치 탐지 (역 × 요일별 robust z-score)
+# ===========================================================
+ANOMALY_WINDOW_WEEKS = 8   # 앞뒤로 각각 몇 주를 기준으로 삼을지
+ANOMALY_MIN_PERIODS = 8    # 기준 구간에 최소 몇 주의 값이 있어야 점수를 매길지
+WEEKDAYS = ["월", "화", "수", "목", "금", "토", "일"]
+
+
+def _nanmedian_last(a):
+    """마지막 축 기준 NaN 무시 중앙값 (정렬 한 번 + take_along_axis)"""
+    s = np.sort(a, axis=-1)  # NaN은 뒤로 정렬됨
+    k = (~np.isnan(s)).sum(axis=-1, keepdims=True)
+    lo = np.take_along_axis(s, np.maximum((k - 1) // 2, 0), axis=-1)
+    hi = np.take_along_axis(s, np.minimum(k // 2, a.shape[-1] - 1), axis=-1)
+    med = ((lo + hi) / 2)[..., 0]
+    med[k[..., 0] == 0] = np.nan
+    return med, k[..., 0]
+
+
+@st.cache_resource(show_spinner="이상치 점수를 계산하는 중...")
+def anomaly_scores(version):
+    """
+    역 × 날짜 승하차 합계 행렬을 (역, 요일, 주) 큐브로 바꾼 뒤,
+    같은 역·같은 요일의 앞뒤 ANOMALY_WINDOW_WEEKS주 (당일 제외) 중앙값/MAD로
+    robust z-score를 한 번에 계산합니다. 역별 파이썬 루프는 없습니다.
+    기준 주가 십여 개뿐이라 MAD가 우연히 작게 나오는 날이 많으므로,
+    역 전체 기간의 (당일 - 기준 중앙값) / 기준 중앙값 MAD를 척도의 하한으로 씁니다.
+    반환값: (역 이름 배열, 날짜 배열, 합계 행렬, 기준 중앙값 행렬, z 행렬)
+    """
+    stations, days, on, off = station_matrix(version)
+    total = on + off
+    n_stations = len(stations)
+
+    # 달력상 빠진 날짜도 자리를 만들어 월요일부터 7일 단위로 정렬
+    day_numbers = days.astype("int64")
+    first_monday = day_numbers[0] - (day_numbers[0] + 3) % 7  # 1970-01-01은 목요일
+    n_weeks = (day_numbers[-1] - first_monday) // 7 + 1
+    calendar = np.full((n_stations, n_weeks * 7), np.nan, dtype="float32")
+    positions = day_numbers - first_monday
+    calendar[:, positions] = total
+
+    cube = calendar.reshape(n_stations, n_weeks, 7).transpose(0, 2, 1)  # (역, 요일, 주)
+
+    # 주 축으로 앞뒤 h주씩 패딩 → 중심(당일)을 뺀 슬라이딩 윈도
+    h = ANOMALY_WINDOW_WEEKS
+    padded = np.pad(cube, ((0, 0), (0, 0), (h, h)), constant_values=np.nan)
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * h + 1, axis=-1)
+    windows = np.delete(windows, h, axis=-1)  # (역, 요일, 주, 2h)
+
+    median, count = _nanmedian_last(windows)
+    mad, _ = _nanmedian_last(np.abs(windows - median[..., None]))
+    # 기준 주들이 거의 같은 값이면 MAD가 0에 가까워지므로 중앙값의 2%(최소 1명)를 하한으로 사용
+    scale = np.maximum(mad, np.maximum(0.02 * median, 1.0))
+
+    # 역별 상대 잔차의 MAD (중앙값 추정 오차까지 포함된 평소 변동 폭) → 기준 중앙값에 곱해 하한으로 사용
+    scored = count >= ANOMALY_MIN_PERIODS
+    with np.errstate(divide="ignore", invalid="ignore"):
+        residual = np.where(scored & (median > 0), np.abs(cube - median) / median, np.nan)
+    pooled, _ = _nanmedian_last(residual.reshape(n_stations, -1))
+    scale = np.fmax(scale, pooled[:, None, None] * median)
+
+    z = 0.6745 * (cube - median) / scale
+    z[~scored] = np.nan
+
+    # (역, 요일, 주) → (역, 날짜)로 되돌려서 실제 적재된 날짜만 남김
+    def to_days(a):
+        return a.transpose(0, 2, 1).reshape(n_stations, n_weeks * 7)[:, positions]
+
+    return stations, days, total, to_days(median), to_days(z)
+
+
+@st.cache_data(show_spinner=False)
+def anomaly_table(version, threshold):
+    """|z| >= threshold 인 (역, 날짜) 목록을 |z| 내림차순 표로 만듭니다."""
+    stations, days, total, median, z = anomaly_scores(version)
+    with np.errstate(invalid="ignore"):
+        rows, cols = np.nonzero(np.abs(z) >= threshold)
+
+    table = pd.DataFrame({
+        "역": stations[rows],
+        "날짜": days[cols].astype("datetime64[ns]"),
+        "요일": np.array(WEEKDAYS)[(days[cols].astype("int64") + 3) % 7],
+        "승하차 합계": total[rows, cols].astype("int64"),
+        "기준(중앙값)": np.round(median[rows, cols]).astype("int64"),
+        "z": np.round(z[rows, cols], 2),
+    })
+    table["변화율(%)"] = np.round(
+        (table["승하차 합계"] / table["기준(중앙값)"].where(table["기준(중앙값)"] > 0) - 1) * 100, 1
+    )
+    order = np.argsort(-np.abs(table["z"].to_numpy()), kind="stable")
+    return table.iloc[order].reset_index(drop=True)
+
+
+sync_source()
 
 # ===========================================================
 # 사이드바 UI
 # ===========================================================
 st.sidebar.header("🔎 조회 조건")
 
-dates = sorted(df_oct["date"].dt.strftime("%Y-%m-%d").unique())
-selected_date = st.sidebar.selectbox("날짜 선택", dates)
+with st.sidebar.expander("📥 일별 데이터 추가"):
+    uploaded_files = st.file_uploader(
+        "사용일자/노선명/역명/승차/하차 CSV", type=["csv"], accept_multiple_files=True
+    )
+    overwrite = st.checkbox("이미 있는 날짜는 덮어쓰기", value=False)
+    if uploaded_files and st.button("저장소에 추가"):
+        # 파일마다 따로 읽어서, 형식이 잘못된 파일은 알려 주고 건너뜀
+        parsed = []
+        for f in uploaded_files:
+            try:
+                parsed.append(_read_source_csv(io.BytesIO(f.getvalue())))
+            except Exception as e:
+                st.error(f"⚠️ {f.name}을(를) 읽지 못해 건너뜁니다. ({type(e).__name__}: {e})")
+        new_df = pd.concat(parsed, ignore_index=True) if parsed else None
+        result = ingest(new_df, overwrite=overwrite) if new_df is not None and len(new_df) else None
+    else:
+        result = None
+    if result is not None:
+        if result["added"] or result["replaced"]:
+            st.success(f"추가 {len(result['added'])}일 / 교체 {len(result['replaced'])}일")
+        if result["duplicate"]:
+            st.info("이미 같은 내용이 있는 날짜 (건너뜀): " + ", ".join(result["duplicate"]))
+        if result["conflict"]:
+            st.warning("이미 다른 내용으로 적재된 날짜: " + ", ".join(result["conflict"]))
+        if result["dup_rows"]:
+            st.warning(f"파일 안의 중복 행 {result['dup_rows']}개는 마지막 값만 사용했습니다.")
 
-lines = sorted(df_oct["line"].unique())
-selected_line = st.sidebar.selectbox("호선 선택", lines)
+rank_index, all_days, lines = load_index(manifest_version())
+
+if len(all_days) == 0:
+    st.warning("저장소에 데이터가 없습니다.")
+    st.stop()
+
+view = st.sidebar.radio("화면", ["Top10 순위", "역별 추이", "이상치 탐지"], horizontal=True)
 
 # ===========================================================
-# 조건 필터링
+# 역별 추이 (전체 기간, 서버에서 LTTB 다운샘플링)
 # ===========================================================
-filtered = df_oct[
-    (df_oct["date"].dt.strftime("%Y-%m-%d") == selected_date) &
-    (df_oct["line"] == selected_line)
-].copy()
+# 브라우저로 보내는 점 수 상한 (모든 trace 합계)
+TREND_POINT_BUDGET = 4000
+
+if view == "역별 추이":
+    stations, matrix_days, on_matrix, off_matrix = station_matrix(manifest_version())
+    station_order = np.argsort(stations)
+    station_row = {name: row for row, name in enumerate(stations)}
 
-if filtered.empty:
-    st.warning("해당 날짜/호선의 데이터가 없습니다.")
+    selected_stations = st.sidebar.multiselect(
+        "역 선택", stations[station_order].tolist(), default=stations[station_order][:1].tolist()
+    )
+    if not selected_stations:
+        st.info("추이를 볼 역을 하나 이상 선택하세요.")
+        st.stop()
+
+    series = [("승차", on_matrix), ("하차", off_matrix)]
+    per_trace = max(100, TREND_POINT_BUDGET // (len(selected_stations) * len(series)))
+    x_all = matrix_days.astype("int64")
+
+    fig_trend = go.Figure()
+    raw_points = shown_points = 0
+    for name in selected_stations:
+        row = station_row[name]
+        for label, matrix in series:
+            y_all = matrix[row]
+            valid = ~np.isnan(y_all)
+            x, y = x_all[valid], y_all[valid]
+            keep = lttb(x, y, per_trace)
+            raw_points += len(x)
+            shown_points += len(keep)
+            fig_trend.add_trace(go.Scattergl(
+                x=matrix_days[valid][keep],
+                y=y[keep],
+                mode="lines",
+                name=f"{name} {label}",
+            ))
+
+    fig_trend.update_layout(
+        title=f"📈 역별 일 승하차 추이 ({matrix_days[0]} ~ {matrix_days[-1]})",
+        xaxis_title="날짜",
+        yaxis_title="승객 수",
+        height=600,
+        hovermode="x unified",
+    )
+    st.plotly_chart(fig_trend, use_container_width=True)
+    st.caption(f"원본 {raw_points:,}개 점 → 표시 {shown_points:,}개 점 (LTTB 다운샘플링, WebGL 렌더링)")
+    st.stop()
+
+# ===========================================================
+# 이상치 탐지 (전체 역, 요일별 기준)
+# ===========================================================
+if view == "이상치 탐지":
+    threshold = st.sidebar.slider("|z| 기준", min_value=2.0, max_value=10.0, value=3.5, step=0.5)
+    anomalies = anomaly_table(manifest_version(), threshold)
+
+    st.subheader("🚨 평소와 다른 날 (역 × 요일별 기준)")
+    st.caption(
+        f"같은 역·같은 요일의 앞뒤 {ANOMALY_WINDOW_WEEKS}주 중앙값/MAD 대비 robust z-score가 "
+        f"{threshold} 이상인 날입니다. 표 머리글을 눌러 정렬할 수 있습니다."
+    )
+    st.metric("탐지된 (역, 날짜)", f"{len(anomalies):,} 건")
+    st.dataframe(anomalies, use_container_width=True, hide_index=True)
     st.stop()
 
-# 승하차 합계 계산
-filtered["total"] = filtered["on"] + filtered["off"]
+mode = st.sidebar.radio("조회 방식", ["하루", "기간 합계"], horizontal=True)
+
+if mode == "하루":
+    # 월 선택 → 해당 월 날짜만 (정렬된 날짜 배열의 범위 슬라이스)
+    months = sorted({str(day)[:7] for day in all_days}, reverse=True)
+    selected_month = st.sidebar.selectbox("월 선택", months)
+    lo, hi = month_bounds(all_days, selected_month)
+    dates = [str(day) for day in all_days[lo:hi]]
+    selected_date = st.sidebar.selectbox("날짜 선택", dates)
+else:
+    first_day, last_day = all_days[0].item(), all_days[-1].item()
+    # 기본값: 가장 최근 달의 첫 날 ~ 마지막 날
+    default_from = all_days[month_bounds(all_days, str(all_days[-1])[:7])[0]].item()
+    date_range = st.sidebar.date_input(
+        "기간 선택", value=(default_from, last_day), min_value=first_day, max_value=last_day
+    )
+    if len(date_range) != 2:
+        st.info("기간의 시작일과 종료일을 모두 선택하세요.")
+        st.stop()
+    date_from, date_to = date_range
 
-# Top10
-top10 = filtered.sort_values("total", ascending=False).head(10)
+selected_line = st.sidebar.selectbox("호선 선택", lines)
 
 # ===========================================================
-# 색상 세팅
+# 조건 조회
 # ===========================================================
-colors = ["red"]  # 1등 빨강
+if mode == "하루":
+    # 인덱스 lookup: 해당 날짜 파티션에서 이미 합계 내림차순으로 정렬된 구간의 앞부분
+    entry = rank_index.get((selected_date, selected_line))
+
+    if entry is None:
+        st.warning("해당 날짜/호선의 데이터가 없습니다.")
+        st.stop()
+
+    rel_path, content_hash, start, stop, on_sum, off_sum = entry
+    top10 = open_partition(rel_path, content_hash).slice(start, min(stop - start, TOP_N)).to_pandas()
+    period_label = selected_date
+else:
+    top10 = range_top_n(rank_index, all_days, date_from, date_to, selected_line)
+
+    if top10.empty:
+        st.warning("해당 기간/호선의 데이터가 없습니다.")
+        st.stop()
+
+    # 기간 합계도 적재 시 미리 집계한 호선별 일 합계만 더함
+    lo = np.searchsorted(all_days, np.datetime64(date_from, "D"), side="left")
+    hi = np.searchsorted(all_days, np.datetime64(date_to, "D"), side="right")
+    entries = [rank_index.get((str(day), selected_line)) for day in all_days[lo:hi]]
+    on_sum = sum(e[4] for e in entries if e is not None)
+    off_sum = sum(e[5] for e in entries if e is not None)
+    period_label = f"{date_from} ~ {date_to}"
 
-# 2~10등 파랑 → 밝아지는 그라데이션
-blue_grad = px.colors.sequential.Blues[2:11]
-colors.extend(blue_grad[:9])
+# 선택 호선의 전체 합계 (적재 시 미리 집계)
+m1, m2 = st.columns(2)
+m1.metric(f"{selected_line} 전체 승차", f"{on_sum:,} 명")
+m2.metric(f"{selected_line} 전체 하차", f"{off_sum:,} 명")
 
 # ===========================================================
-# Plotly 그래프
+# Plotly 그래프 (1등 빨강 + 파랑 그라데이션, ranked_bar 공통 모듈)
 # ===========================================================
-fig = px.bar(
+fig = ranked_bar_chart(
     top10,
-    x="station",
-    y="total",
-    color=top10.index,
-    title=f"📊 {selected_date} / {selected_line} 승하차 총합 Top 10",
-    color_discrete_sequence=colors
+    "station",
+    "total",
+    title=f"📊 {period_label} / {selected_line} 승하차 총합 Top 10",
 )
 
 fig.update_layout(
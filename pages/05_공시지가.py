@@ -1,24 +1,603 @@
+import csv
+import hashlib
+import io
+import threading
+import time
+from collections import OrderedDict
+
 import streamlit as st
+import numpy as np
 import pandas as pd
-import plotly.express as px
+import plotly.graph_objects as go
+
+from geo_grid import EARTH_RADIUS_M, build_grid_index, grid_candidates, haversine_m, query_bbox
+from ranked_bar import MAX_BARS, ranked_bar_chart
 
 st.set_page_config(page_title="지역별 땅값 분석", layout="wide")
 
 st.title("🏙️ 지역별 땅값 분석 + 지도 시각화 (Plotly)")
 
+# ---------------------------
+# 0) 업로드 파일 캐시 (내용 해시 + 선택 컬럼 → 파싱된 DataFrame)
+# ---------------------------
+# 최근에 쓴 순서(LRU)로 보관하고, 합계 메모리가 상한을 넘으면 오래된 것부터 버림
+UPLOAD_CACHE_MAX_BYTES = 1 << 30  # 1GB
+UPLOAD_CACHE_MAX_FILES = 4
+
+# 헤더 추정에 쓰는 앞부분 크기 / 본문을 읽는 청크 행 수
+SNIFF_BYTES = 1 << 16
+CHUNK_ROWS = 200_000
+
+
+@st.cache_resource
+def _upload_cache():
+    # file_id → 내용 해시 (같은 업로드는 다시 해시하지 않음), (내용 해시, 컬럼) → (데이터, 메모리 크기)
+    # jobs: (내용 해시, 컬럼) → 백그라운드 처리 상태
+    return {"lock": threading.Lock(), "hashes": {}, "frames": OrderedDict(), "bytes": 0, "jobs": {}}
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def sniff_header(head):
+    """
+    파일 앞부분만 보고 인코딩, 구분자, 컬럼 목록, 숫자 컬럼을 추정합니다.
+    반환값: {"encoding", "sep", "columns", "numeric"}
+    """
+    # 줄 단위로 자르면 멀티바이트 문자가 중간에 잘리지 않음 (\n은 cp949/utf-8 문자 안에 나오지 않음)
+    if len(head) == SNIFF_BYTES and b"\n" in head:
+        head = head[:head.rfind(b"\n") + 1]
+
+    for encoding in ("utf-8-sig", "cp949"):
+        try:
+            text = head.decode(encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+    else:
+        encoding, text = "latin-1", head.decode("latin-1")
+
+    try:
+        sep = csv.Sniffer().sniff(text.split("\n", 1)[0], delimiters=",;\t|").delimiter
+    except csv.Error:
+        sep = ","
+
+    sample = pd.read_csv(io.StringIO(text), sep=sep)
+    numeric = [c for c in sample.columns if pd.api.types.is_numeric_dtype(sample[c])]
+    return {"encoding": encoding, "sep": sep, "columns": list(sample.columns), "numeric": numeric}
+
+
+def _read_columns(data, info, usecols, progress=None):
+    """
+    선택한 컬럼만 청크 단위로 읽어서 작은 타입으로 바로 줄입니다.
+    (문자열 → category, 위도/경도 → float32, 숫자 → 가능한 가장 작은 타입)
+    """
+    text_cols = [c for c in usecols if c not in info["numeric"]]
+    buffer = io.BytesIO(data)
+    reader = pd.read_csv(
+        buffer,
+        encoding=info["encoding"],
+        sep=info["sep"],
+        usecols=usecols,
+        dtype={c: "str" for c in text_cols},
+        chunksize=CHUNK_ROWS,
+    )
+
+    chunks = []
+    for chunk in reader:
+        for col in chunk.columns:
+            if col in text_cols:
+                chunk[col] = chunk[col].astype("category")
+            else:
+                chunk[col] = pd.to_numeric(chunk[col], errors="coerce")
+        chunks.append(chunk)
+        if progress is not None:
+            progress(min(buffer.tell() / max(len(data), 1), 1.0), chunk)
+
+    if not chunks:
+        return pd.DataFrame(columns=usecols)
+
+    df = pd.concat(chunks, ignore_index=True)
+    for col in text_cols:
+        # 청크마다 카테고리가 달라서 concat 후 문자열로 풀린 컬럼을 다시 category로
+        if not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    for col in df.columns:
+        if col in text_cols:
+            continue
+        if df[col].notna().all() and (df[col] % 1 == 0).all():
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+    return df
+
+
+def _content_hash(uploaded_file):
+    cache = _upload_cache()
+    with cache["lock"]:
+        key = cache["hashes"].get(uploaded_file.file_id)
+    if key is None:
+        key = hashlib.sha1(uploaded_file.getvalue()).hexdigest()
+        with cache["lock"]:
+            cache["hashes"][uploaded_file.file_id] = key
+    return key
+
+
+# 지역별 분포 요약에 쓰는 백분위 / 히스토그램 구간 수
+PERCENTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+HIST_BINS = 30
+
+
+def build_region_stats(df, region_col, price_col):
+    """
+    지역별 통계를 한 번의 정렬/집계로 미리 계산합니다.
+    지역 전환은 bounds 구간을 잘라 쓰는 lookup이 됩니다.
+
+    반환값 (지역 코드 r 기준):
+      order[bounds[r]:bounds[r+1]]  해당 지역 행 번호 (땅값 내림차순)
+      count / mean / min / max      [r]
+      pct[r, j]                     PERCENTILES[j] 백분위 값
+      hist[r], edges                로그 간격 히스토그램
+    """
+    codes = df[region_col].cat.codes.to_numpy().astype("int64")
+    prices = df[price_col].to_numpy(dtype="float64", na_value=np.nan)
+    labels = np.asarray(df[region_col].cat.categories, dtype=object)
+    n = len(labels)
+
+    # (지역, 땅값 내림차순) 정렬 — 지역/땅값이 없는 행은 제외
+    valid = (codes >= 0) & ~np.isnan(prices)
+    order = np.flatnonzero(valid)
+    order = order[np.lexsort((-prices[order], codes[order]))]
+    sorted_codes, sorted_prices = codes[order], prices[order]
+    bounds = np.searchsorted(sorted_codes, np.arange(n + 1))
+    count = np.diff(bounds)
+    has = count > 0
+
+    total = np.bincount(sorted_codes, weights=sorted_prices, minlength=n)
+    mean = np.divide(total, count, out=np.full(n, np.nan), where=has)
+    starts = np.minimum(bounds[:-1], len(order) - 1)
+    stops = np.maximum(bounds[1:] - 1, 0)
+    mx = np.where(has, sorted_prices[starts] if len(order) else np.nan, np.nan)
+    mn = np.where(has, sorted_prices[stops] if len(order) else np.nan, np.nan)
+
+    # 내림차순 구간에서 오름차순 k번째 = bounds[r+1] - 1 - k (선형 보간)
+    pct = np.full((n, len(PERCENTILES)), np.nan)
+    if len(order):
+        for j, q in enumerate(PERCENTILES):
+            pos = q * np.maximum(count - 1, 0)
+            lo, hi = np.floor(pos).astype(int), np.ceil(pos).astype(int)
+            v_lo = sorted_prices[np.clip(bounds[1:] - 1 - lo, 0, len(order) - 1)]
+            v_hi = sorted_prices[np.clip(bounds[1:] - 1 - hi, 0, len(order) - 1)]
+            pct[:, j] = np.where(has, v_lo + (v_hi - v_lo) * (pos - lo), np.nan)
+
+    # 전 지역 공통 로그 구간 → (지역, 구간) 한 번에 bincount
+    positive = sorted_prices[sorted_prices > 0]
+    lo_edge = positive.min() if len(positive) else 1.0
+    hi_edge = max(sorted_prices.max() if len(order) else 1.0, lo_edge * 1.01)
+    edges = np.geomspace(lo_edge, hi_edge, HIST_BINS + 1)
+    bins = np.clip(np.searchsorted(edges, sorted_prices, side="right") - 1, 0, HIST_BINS - 1)
+    hist = np.bincount(sorted_codes * HIST_BINS + bins, minlength=n * HIST_BINS).reshape(n, HIST_BINS)
+
+    return {
+        "labels": labels,
+        "index": {label: r for r, label in enumerate(labels)},
+        "regions": sorted(labels[has]),
+        "order": order,
+        "bounds": bounds,
+        "count": count,
+        "mean": mean,
+        "min": mn,
+        "max": mx,
+        "pct": pct,
+        "edges": edges,
+        "hist": hist,
+    }
+
+
+# 지도 집계: 웹 메르카토르 격자 피라미드 (줌 z → 셀 레벨 z + CELL_SHIFT, 셀 한 칸 = 32px)
+MAP_WIDTH, MAP_HEIGHT = 900, 600
+CELL_SHIFT = 3
+CELL_PX = 256 >> CELL_SHIFT
+MIN_ZOOM, MAX_ZOOM = 5, 14
+# 보이는 필지가 이 개수 이하일 때만 개별 점으로 그림
+POINT_LIMIT = 3000
+# 화면 바깥으로 더 보내는 여유 (화면 크기 대비, 0.5면 사방으로 반 화면씩) — 조금 끌어도 빈 지도가 안 보이게
+MAP_MARGIN = 0.5
+_KEY_BITS = 18
+
+
+def mercator(lat, lon):
+    """위도/경도 → 웹 메르카토르 정규 좌표 (0~1, y는 북쪽이 0)"""
+    s = np.sin(np.radians(np.clip(lat, -85.0, 85.0)))
+    return (lon + 180.0) / 360.0, 0.5 - np.log((1 + s) / (1 - s)) / (4 * np.pi)
+
+
+def _aggregate_cells(key, count, total, low, high, lat_sum, lon_sum):
+    """같은 key끼리 합치기 (count/합계/최소/최대)"""
+    if not len(key):
+        return {"key": key, "count": count, "total": total, "min": low, "max": high,
+                "lat_sum": lat_sum, "lon_sum": lon_sum}
+    order = np.argsort(key, kind="stable")
+    key = key[order]
+    starts = np.r_[0, np.flatnonzero(key[1:] != key[:-1]) + 1]
+    return {
+        "key": key[starts],
+        "count": np.add.reduceat(count[order], starts),
+        "total": np.add.reduceat(total[order], starts),
+        "min": np.minimum.reduceat(low[order], starts),
+        "max": np.maximum.reduceat(high[order], starts),
+        "lat_sum": np.add.reduceat(lat_sum[order], starts),
+        "lon_sum": np.add.reduceat(lon_sum[order], starts),
+    }
+
+
+def build_map_pyramid(df, stats, price_col, lat_col, lon_col):
+    """
+    (지역, 격자 셀)별 필지 수 / 땅값 합계·최소·최대 / 좌표 평균을 줌 단계별로 미리 계산합니다.
+    가장 세밀한 레벨만 행에서 집계하고, 위 레벨은 아래 레벨 셀을 2×2로 합쳐서 만듭니다.
+    셀 key = 지역 코드 << 36 | x << 18 | y (정렬되어 있어서 지역 구간은 이진 탐색)
+    """
+    order = stats["order"]
+    codes = np.repeat(np.arange(len(stats["count"]), dtype="int64"), stats["count"])
+    lat = df[lat_col].to_numpy(dtype="float64", na_value=np.nan)[order]
+    lon = df[lon_col].to_numpy(dtype="float64", na_value=np.nan)[order]
+    price = df[price_col].to_numpy(dtype="float64", na_value=np.nan)[order]
+    mx, my = mercator(lat, lon)
+    ok = ~(np.isnan(mx) | np.isnan(my))
+
+    level = MAX_ZOOM + CELL_SHIFT
+    size = 1 << level
+    x = np.clip(mx[ok] * size, 0, size - 1).astype("int64")
+    y = np.clip(my[ok] * size, 0, size - 1).astype("int64")
+    key = (codes[ok] << (2 * _KEY_BITS)) | (x << _KEY_BITS) | y
+    ones = np.ones(len(key), dtype="int64")
+    cells = _aggregate_cells(key, ones, price[ok], price[ok], price[ok], lat[ok], lon[ok])
+
+    levels = {level: cells}
+    fit = _fit_views(cells, len(stats["count"]))
+    mask = (1 << _KEY_BITS) - 1
+    for level in range(MAX_ZOOM + CELL_SHIFT - 1, MIN_ZOOM + CELL_SHIFT - 1, -1):
+        key = cells["key"]
+        parent = ((key >> (2 * _KEY_BITS)) << (2 * _KEY_BITS)) \
+            | (((key >> _KEY_BITS & mask) >> 1) << _KEY_BITS) | ((key & mask) >> 1)
+        cells = _aggregate_cells(parent, cells["count"], cells["total"], cells["min"], cells["max"],
+                                 cells["lat_sum"], cells["lon_sum"])
+        levels[level] = cells
+
+    # 개별 점 표시용: 지역 정렬 순서의 메르카토르 좌표 (좌표 없는 행은 NaN)
+    return {"levels": levels, "fit": fit, "mx": mx.astype("float32"), "my": my.astype("float32")}
+
+
+def _fit_views(cells, n_regions):
+    """지역별로 전체가 화면에 들어오는 (줌, 중심 위도, 중심 경도) — 가장 세밀한 레벨 셀 기준"""
+    fit = np.tile([MIN_ZOOM, 36.5, 127.8], (n_regions, 1))
+    codes = cells["key"] >> (2 * _KEY_BITS)
+    bounds = np.searchsorted(codes, np.arange(n_regions + 1))
+    has = np.flatnonzero(np.diff(bounds) > 0)
+    if not len(has):
+        return fit
+    starts = bounds[has]
+    mx, my = mercator(cells["lat_sum"] / cells["count"], cells["lon_sum"] / cells["count"])
+    span_x = (np.maximum.reduceat(mx, starts) - np.minimum.reduceat(mx, starts)) * 256
+    span_y = (np.maximum.reduceat(my, starts) - np.minimum.reduceat(my, starts)) * 256
+    with np.errstate(divide="ignore"):
+        zoom = np.floor(np.log2(np.minimum(MAP_WIDTH / span_x, MAP_HEIGHT / span_y)))
+    count = np.add.reduceat(cells["count"], starts)
+    fit[has, 0] = np.clip(zoom, MIN_ZOOM, MAX_ZOOM)
+    fit[has, 1] = np.add.reduceat(cells["lat_sum"], starts) / count
+    fit[has, 2] = np.add.reduceat(cells["lon_sum"], starts) / count
+    return fit
+
+
+def fit_view(pyramid, r):
+    zoom, center_lat, center_lon = pyramid["fit"][r]
+    return int(zoom), center_lat, center_lon
+
+
+def map_view(pyramid, stats, r, zoom, center_lat, center_lon):
+    """
+    화면(줌 + 중심) 안의 데이터만 고릅니다 (사방으로 MAP_MARGIN만큼 여유 포함).
+    보이는 필지가 POINT_LIMIT 이하이면 ("points", 지역 내 행 위치), 아니면 ("cells", 셀 dict).
+    """
+    level = zoom + CELL_SHIFT
+    cells = pyramid["levels"][level]
+    lo, hi = np.searchsorted(cells["key"], [r << (2 * _KEY_BITS), (r + 1) << (2 * _KEY_BITS)])
+    mask = (1 << _KEY_BITS) - 1
+    cx = cells["key"][lo:hi] >> _KEY_BITS & mask
+    cy = cells["key"][lo:hi] & mask
+
+    # 화면 범위를 셀 좌표로 (셀 한 칸 = CELL_PX)
+    mx, my = mercator(center_lat, center_lon)
+    half_x = MAP_WIDTH * (0.5 + MAP_MARGIN) / CELL_PX
+    half_y = MAP_HEIGHT * (0.5 + MAP_MARGIN) / CELL_PX
+    x0, x1 = mx * (1 << level) - half_x, mx * (1 << level) + half_x
+    y0, y1 = my * (1 << level) - half_y, my * (1 << level) + half_y
+    in_view = (cx >= np.floor(x0)) & (cx <= x1) & (cy >= np.floor(y0)) & (cy <= y1)
+
+    if cells["count"][lo:hi][in_view].sum() <= POINT_LIMIT:
+        start, stop = stats["bounds"][r], stats["bounds"][r + 1]
+        px_ = pyramid["mx"][start:stop] * (1 << level)
+        py_ = pyramid["my"][start:stop] * (1 << level)
+        inside = (px_ >= np.floor(x0)) & (px_ < np.floor(x1) + 1) & (py_ >= np.floor(y0)) & (py_ < np.floor(y1) + 1)
+        return "points", np.flatnonzero(inside)
+
+    idx = np.arange(lo, hi)[in_view]
+    count = cells["count"][idx]
+    return "cells", {
+        "count": count,
+        "mean": cells["total"][idx] / count,
+        "min": cells["min"][idx],
+        "max": cells["max"][idx],
+        "lat": cells["lat_sum"][idx] / count,
+        "lon": cells["lon_sum"][idx] / count,
+    }
+
+
+def map_figure(kind, data, zoom, center_lat, center_lon, price_col, lat_col, lon_col):
+    if kind == "points":
+        price = data[price_col].to_numpy(dtype="float64")
+        size = 6 + 10 * np.sqrt(price / np.nanmax(price)) if len(price) else 8
+        trace = go.Scattermap(
+            lat=data[lat_col], lon=data[lon_col],
+            mode="markers",
+            marker=dict(size=size, color=price, colorscale="Turbo", showscale=True),
+            hovertemplate=f"{price_col}: %{{marker.color:,.0f}}<extra></extra>",
+        )
+    else:
+        size = 8 + 22 * np.sqrt(data["count"] / data["count"].max())
+        trace = go.Scattermap(
+            lat=data["lat"], lon=data["lon"],
+            mode="markers",
+            marker=dict(size=size, color=data["mean"], colorscale="Turbo", opacity=0.8, showscale=True),
+            customdata=np.column_stack([data["count"], data["min"], data["max"]]),
+            hovertemplate=(
+                "필지 %{customdata[0]:,}개<br>평균 %{marker.color:,.0f}<br>"
+                "최저 %{customdata[1]:,.0f} / 최고 %{customdata[2]:,.0f}<extra></extra>"
+            ),
+        )
+    fig = go.Figure(trace)
+    # 토큰이 필요 없는 MapLibre 기반 open-street-map 스타일
+    fig.update_layout(
+        map=dict(style="open-street-map", center=dict(lat=center_lat, lon=center_lon), zoom=zoom),
+        height=MAP_HEIGHT,
+        margin={"r": 0, "t": 0, "l": 0, "b": 0},
+    )
+    return fig
+
+
+# 주변 검색용 균일 격자 인덱스 (geo_grid 공통 모듈, 셀 크기는 위도 기준 약 550m)
+GRID_DEG = 0.005
+
+
+def build_spatial_index(df, price_col, lat_col, lon_col):
+    """
+    위도/경도 균일 격자 인덱스를 한 번 만듭니다 (좌표는 float32로 보관).
+    반환값의 rows는 df 행 번호, lat/lon/price는 같은 순서로 정렬된 사본입니다.
+    """
+    index = build_grid_index(
+        df[lat_col].to_numpy(dtype="float64", na_value=np.nan),
+        df[lon_col].to_numpy(dtype="float64", na_value=np.nan),
+        GRID_DEG,
+        dtype="float32",
+    )
+    if index is not None:
+        index["price"] = df[price_col].to_numpy(dtype="float64", na_value=np.nan)[index["rows"]]
+    return index
+
+
+def _radius_positions(index, lat, lon, radius_m):
+    d_lat = np.degrees(radius_m / EARTH_RADIUS_M)
+    d_lon = d_lat / max(np.cos(np.radians(lat)), 1e-6)
+    pos = grid_candidates(index, lat - d_lat, lat + d_lat, lon - d_lon, lon + d_lon)
+    dist = haversine_m(lat, lon, index["lat"][pos].astype("float64"), index["lon"][pos].astype("float64"))
+    inside = dist <= radius_m
+    return pos[inside], dist[inside]
+
+
+def query_radius(index, lat, lon, radius_m):
+    """중심에서 radius_m 안 필지의 (df 행 번호, 거리 m) — 가까운 순"""
+    pos, dist = _radius_positions(index, lat, lon, radius_m)
+    order = np.argsort(dist, kind="stable")
+    return index["rows"][pos[order]], dist[order]
+
+
+def cheapest_near(index, lat, lon, radius_m, k):
+    """반경 안에서 땅값이 가장 낮은 k개 필지의 (df 행 번호, 거리 m) — 싼 순"""
+    pos, dist = _radius_positions(index, lat, lon, radius_m)
+    k = min(k, len(pos))
+    if k == 0:
+        return index["rows"][pos], dist
+    price = np.nan_to_num(index["price"][pos], nan=np.inf)
+    top = np.argpartition(price, k - 1)[:k]
+    top = top[np.argsort(price[top], kind="stable")]
+    return index["rows"][pos[top]], dist[top]
+
+
+def _nbytes(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, dict):
+        return sum(_nbytes(v) for v in obj.values())
+    return 0
+
+
+class UploadCancelled(Exception):
+    pass
+
+
+def _store_dataset(key, dataset):
+    cache = _upload_cache()
+    size = int(dataset["df"].memory_usage(deep=True).sum()) + sum(
+        _nbytes(dataset[k]) for k in ("stats", "map", "grid")
+    )
+    with cache["lock"]:
+        frames = cache["frames"]
+        if key not in frames:
+            frames[key] = (dataset, size)
+            cache["bytes"] += size
+        # 방금 넣은 파일 하나는 상한을 넘어도 남겨 둠
+        while len(frames) > 1 and (
+            cache["bytes"] > UPLOAD_CACHE_MAX_BYTES or len(frames) > UPLOAD_CACHE_MAX_FILES
+        ):
+            _, (_, old_size) = frames.popitem(last=False)
+            cache["bytes"] -= old_size
+        live = {k[0] for k in frames} | {k[0] for k in cache["jobs"]}
+        cache["hashes"] = {fid: h for fid, h in cache["hashes"].items() if h in live}
+
+
+def _process_upload(job, data, info, region_col, price_col, lat_col, lon_col):
+    """
+    작업 스레드에서 파싱 → 타입 변환 → 지역 통계 → 지도 집계 → 격자 인덱스를 만듭니다.
+    st.* 는 호출하지 않고 job dict만 갱신합니다 (화면은 스크립트 쪽에서 polling).
+    """
+    def step(stage, progress=None):
+        if job["cancel"].is_set():
+            raise UploadCancelled()
+        job["stage"] = stage
+        if progress is not None:
+            job["progress"] = progress
+
+    def on_chunk(done, chunk):
+        # 읽기는 전체 진행률의 80%로 표시
+        step(f"CSV 파일을 읽는 중... {done:.0%}", 0.8 * done)
+        if job["preview"] is None:
+            job["preview"] = chunk.head(20)
+
+    try:
+        usecols = list(dict.fromkeys([region_col, price_col, lat_col, lon_col]))
+        df = _read_columns(data, info, usecols, progress=on_chunk)
+        for col in (lat_col, lon_col):
+            df[col] = df[col].astype("float32")
+        if not isinstance(df[region_col].dtype, pd.CategoricalDtype):
+            df[region_col] = df[region_col].astype("category")
+
+        step("지역별 통계를 계산하는 중...", 0.85)
+        stats = build_region_stats(df, region_col, price_col)
+        step("지도 집계를 준비하는 중...", 0.9)
+        pyramid = build_map_pyramid(df, stats, price_col, lat_col, lon_col)
+        step("주변 검색 인덱스를 만드는 중...", 0.95)
+        grid = build_spatial_index(df, price_col, lat_col, lon_col)
+        step("완료", 1.0)
+
+        _store_dataset(job["key"], {"df": df, "stats": stats, "map": pyramid, "grid": grid})
+        job["state"] = "done"
+    except UploadCancelled:
+        job["state"] = "cancelled"
+    except Exception as e:
+        job["state"] = "error"
+        job["error"] = f"{type(e).__name__}: {e}"
+
+
+def load_upload(uploaded_file, info, region_col, price_col, lat_col, lon_col):
+    """
+    같은 내용의 파일 + 같은 컬럼 선택이면 캐시된 데이터를 바로 돌려줍니다.
+    없으면 작업 스레드에서 처리를 시작하고 (None, job)을 돌려줍니다.
+    반환값: (데이터 {"df", "stats", "map", "grid"} 또는 None, job 또는 None)
+    """
+    cache = _upload_cache()
+    key = (_content_hash(uploaded_file), region_col, price_col, lat_col, lon_col)
+
+    with cache["lock"]:
+        if key in cache["frames"]:
+            cache["frames"].move_to_end(key)
+            cache["jobs"].pop(key, None)
+            return cache["frames"][key][0], None
+
+        job = cache["jobs"].get(key)
+        # 끝났는데 결과가 LRU에서 밀려난 작업은 버리고 새로 시작 (안 그러면 done → rerun이 끝없이 반복)
+        if job is not None and job["state"] == "done":
+            job = None
+        if job is None:
+            # 같은 파일의 다른 컬럼 조합으로 돌던 작업은 취소 (컬럼을 바꿀 때마다 전체 파싱이 쌓이지 않게)
+            for other_key in [k for k in cache["jobs"] if k[0] == key[0] and k != key]:
+                cache["jobs"].pop(other_key)["cancel"].set()
+            job = {
+                "key": key,
+                "state": "running",
+                "stage": "CSV 파일을 읽는 중...",
+                "progress": 0.0,
+                "preview": None,
+                "error": None,
+                "cancel": threading.Event(),
+            }
+            cache["jobs"][key] = job
+            threading.Thread(
+                target=_process_upload,
+                args=(job, uploaded_file.getvalue(), info, region_col, price_col, lat_col, lon_col),
+                daemon=True,
+            ).start()
+    return None, job
+
+
+def forget_job(job):
+    with _upload_cache()["lock"]:
+        _upload_cache()["jobs"].pop(job["key"], None)
+
+
+@st.fragment(run_every=0.5)
+def show_upload_job(job):
+    """작업 진행률 / 첫 청크 미리보기 / 취소 버튼 (끝나면 전체 화면을 다시 실행)"""
+    if job["state"] == "done":
+        st.rerun()
+    if job["state"] == "cancelled":
+        st.warning("처리를 취소했습니다.")
+        if st.button("다시 시작"):
+            forget_job(job)
+            st.rerun()
+        return
+    if job["state"] == "error":
+        st.error(f"⚠️ 파일을 처리하지 못했습니다. ({job['error']})")
+        if st.button("다시 시도"):
+            forget_job(job)
+            st.rerun()
+        return
+
+    st.progress(job["progress"], text=job["stage"])
+    if st.button("취소"):
+        job["cancel"].set()
+    if job["preview"] is not None:
+        st.caption("첫 부분 미리보기")
+        st.dataframe(job["preview"], hide_index=True, use_container_width=True)
+
+
+def histogram_figure(stats, r, price_col):
+    """미리 계산된 구간 개수로 그리는 히스토그램 (행 데이터를 다시 보지 않음)"""
+    edges = stats["edges"]
+    fig = go.Figure(go.Bar(
+        x=np.sqrt(edges[:-1] * edges[1:]),
+        y=stats["hist"][r],
+        width=np.diff(edges),
+        marker_color="steelblue",
+        hovertemplate="%{x:,.0f} 부근: %{y:,}필지<extra></extra>",
+    ))
+    for q, value in zip(PERCENTILES, stats["pct"][r]):
+        if q in (0.25, 0.5, 0.75):
+            fig.add_vline(x=value, line_dash="dash", line_color="red" if q == 0.5 else "gray",
+                          annotation_text=f"P{int(q * 100)}")
+    fig.update_layout(
+        xaxis_type="log",
+        xaxis_title=f"{price_col} (로그 축)",
+        yaxis_title="필지 수",
+        bargap=0,
+        height=350,
+        margin=dict(l=10, r=10, t=30, b=10),
+    )
+    return fig
+
+
 # ---------------------------
 # 1) CSV 업로드
 # ---------------------------
 uploaded_file = st.file_uploader("CSV 파일을 업로드하세요.", type=["csv"])
 
 if uploaded_file is not None:
-    df = pd.read_csv(uploaded_file)
+    # 헤더만 읽어서 컬럼 후보 추정 (본문은 컬럼을 고른 뒤에 필요한 컬럼만 읽음)
+    info = sniff_header(uploaded_file.getvalue()[:SNIFF_BYTES])
+    columns, numeric = info["columns"], info["numeric"]
 
     # 지역 컬럼 추정
-    region_candidates = [c for c in df.columns if "지역" in c or "구" in c or "시" in c or "region" in c.lower()]
-    price_candidates = [c for c in df.columns if "값" in c or "가격" in c or "지" in c or "price" in c.lower()]
-    lat_candidates = [c for c in df.columns if "lat" in c.lower() or "위도" in c]
-    lon_candidates = [c for c in df.columns if "lon" in c.lower() or "lng" in c.lower() or "경도" in c]
+    region_candidates = [c for c in columns if "지역" in c or "구" in c or "시" in c or "region" in c.lower()]
+    price_candidates = [c for c in columns if "값" in c or "가격" in c or "지" in c or "price" in c.lower()]
+    # 땅값은 숫자 컬럼이어야 함 (예: '지역'도 '지'를 포함)
+    price_candidates = [c for c in price_candidates if c in numeric] or price_candidates
+    lat_candidates = [c for c in columns if "lat" in c.lower() or "위도" in c]
+    lon_candidates = [c for c in columns if "lon" in c.lower() or "lng" in c.lower() or "경도" in c]
 
     if region_candidates and price_candidates:
         region_col = st.selectbox("지역 컬럼을 선택하세요", region_candidates)
@@ -32,72 +611,138 @@ if uploaded_file is not None:
             st.error("⚠️ 지도 시각화를 위해 위도(lat), 경도(lon) 컬럼이 필요합니다.")
             st.stop()
 
+        # 선택한 컬럼만 읽고 지역별 통계까지 한 번에 계산 (작업 스레드 + 캐시)
+        dataset, job = load_upload(uploaded_file, info, region_col, price_col, lat_col, lon_col)
+        if dataset is None:
+            st.caption("컬럼: " + ", ".join(columns))
+            show_upload_job(job)
+            st.stop()
+        df, stats = dataset["df"], dataset["stats"]
+
         # ---------------------------
         # 2) 지역 선택
         # ---------------------------
-        regions = sorted(df[region_col].unique())
-        selected_region = st.selectbox("지역을 선택하세요", regions)
+        selected_region = st.selectbox("지역을 선택하세요", stats["regions"])
 
         # ---------------------------
-        # 3) 지역 필터링
+        # 3) 지역 필터링 (미리 정렬된 구간 lookup)
         # ---------------------------
-        filtered = df[df[region_col] == selected_region].copy()
+        r = stats["index"][selected_region]
+        rows = stats["order"][stats["bounds"][r]:stats["bounds"][r + 1]]
+        filtered = df.iloc[rows]
 
         # ---------------------------
-        # 4) 막대 그래프 색상 (1등=빨간색)
+        # 4) 땅값 분포 (백분위 / 히스토그램)
         # ---------------------------
-        filtered_sorted = filtered.sort_values(price_col, ascending=False).reset_index(drop=True)
+        st.subheader("📈 선택 지역의 땅값 분포")
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("필지 수", f"{stats['count'][r]:,}")
+        c2.metric("평균", f"{stats['mean'][r]:,.0f}")
+        c3.metric("중앙값", f"{stats['pct'][r][PERCENTILES.index(0.5)]:,.0f}")
+        c4.metric("최저 ~ 최고", f"{stats['min'][r]:,.0f} ~ {stats['max'][r]:,.0f}")
 
-        max_v = filtered_sorted[price_col].max()
-        min_v = filtered_sorted[price_col].min()
-
-        plot_colors = []
-        for i, val in enumerate(filtered_sorted[price_col]):
-            if i == 0:
-                plot_colors.append("red")
-            else:
-                ratio = (val - min_v) / (max_v - min_v + 1e-9)
-                r = int(50 - 40 * ratio)
-                g = int(150 - 100 * ratio)
-                b = int(255 - 150 * ratio)
-                plot_colors.append(f"rgb({r},{g},{b})")
+        h1, h2 = st.columns([1, 2])
+        h1.dataframe(
+            pd.DataFrame({
+                "백분위": [f"P{int(q * 100)}" for q in PERCENTILES],
+                price_col: stats["pct"][r].round(0),
+            }),
+            hide_index=True,
+            use_container_width=True,
+        )
+        h2.plotly_chart(histogram_figure(stats, r, price_col), use_container_width=True)
 
         # ---------------------------
-        # 5) 막대 그래프
+        # 5) 막대 그래프 (1등=빨간색, 나머지는 값 크기에 따른 그라데이션)
         # ---------------------------
         st.subheader("📊 선택 지역의 땅값 막대 그래프")
-        fig_bar = px.bar(
+        # 이미 땅값 내림차순이므로 상위 구간만 잘라서 그림
+        filtered_sorted = filtered.iloc[:MAX_BARS].reset_index(drop=True)
+        filtered_sorted["순위"] = (filtered_sorted.index + 1).astype(str) + "위"
+        bar_title = f"{selected_region} 지역 땅값 분석"
+        if stats["count"][r] > MAX_BARS:
+            bar_title += f" (상위 {MAX_BARS}개 / 전체 {stats['count'][r]:,}개)"
+        fig_bar = ranked_bar_chart(
             filtered_sorted,
-            x=region_col,
-            y=price_col,
-            title=f"{selected_region} 지역 땅값 분석",
+            "순위",
+            price_col,
+            title=bar_title,
+            color_by="value",
         )
-        fig_bar.update_traces(marker_color=plot_colors)
         st.plotly_chart(fig_bar, use_container_width=True)
 
         # ---------------------------
-        # 6) 지도 시각화 (Plotly Scatter Mapbox)
+        # 6) 지도 시각화 (줌에 따라 격자 집계 ↔ 개별 필지)
         # ---------------------------
         st.subheader("🗺️ 지도 시각화 (Plotly Map)")
 
-        # Plotly 기본 토큰 없이 가능한 무료 tileset 사용
-        fig_map = px.scatter_mapbox(
-            filtered,
-            lat=lat_col,
-            lon=lon_col,
-            color=price_col,
-            size=price_col,
-            hover_name=region_col,
-            zoom=10,
-            height=600,
-            color_continuous_scale="Turbo",
-        )
+        # 기본은 지역 전체가 들어오는 줌/중심, 확대한 뒤에는 중심을 옮겨서 다른 곳을 봄
+        fit_zoom, fit_lat, fit_lon = fit_view(dataset["map"], r)
+        c_zoom, c_lat, c_lon = st.columns([2, 1, 1])
+        zoom = c_zoom.slider("지도 확대 수준", MIN_ZOOM, MAX_ZOOM, fit_zoom, key=f"map_zoom_{selected_region}")
+        center_lat = c_lat.number_input("지도 중심 위도", value=float(fit_lat), step=0.01, format="%.5f",
+                                        key=f"map_lat_{selected_region}")
+        center_lon = c_lon.number_input("지도 중심 경도", value=float(fit_lon), step=0.01, format="%.5f",
+                                        key=f"map_lon_{selected_region}")
+        kind, data = map_view(dataset["map"], stats, r, zoom, center_lat, center_lon)
+        if kind == "points":
+            data = filtered.iloc[data]
+            st.caption(f"화면 주변의 필지 {len(data):,}개를 개별 점으로 표시합니다.")
+        else:
+            st.caption(
+                f"화면 주변의 필지 {data['count'].sum():,}개를 격자 {len(data['count']):,}칸으로 묶어 "
+                f"평균 땅값으로 표시합니다. 더 확대하면 개별 필지가 보입니다."
+            )
+        if zoom > fit_zoom:
+            st.caption("확대한 상태에서는 화면 주변만 보냅니다. 다른 곳을 보려면 지도 중심 위도/경도를 바꾸세요.")
+
+        fig_map = map_figure(kind, data, zoom, center_lat, center_lon, price_col, lat_col, lon_col)
+        st.plotly_chart(fig_map, use_container_width=True, key="region_map")
 
-        # Mapbox 오픈 소스 스타일 사용 (무료)
-        fig_map.update_layout(mapbox_style="open-street-map")
-        fig_map.update_layout(margin={"r":0,"t":0,"l":0,"b":0})
+        # ---------------------------
+        # 7) 주변 필지 검색 (격자 인덱스)
+        # ---------------------------
+        st.subheader("📍 주변 필지 검색")
+        grid = dataset["grid"]
+        if grid is None:
+            st.info("좌표가 있는 필지가 없습니다.")
+            st.stop()
+
+        q1, q2, q3 = st.columns(3)
+        q_lat = q1.number_input("중심 위도", value=float(center_lat), format="%.5f", key=f"q_lat_{selected_region}")
+        q_lon = q2.number_input("중심 경도", value=float(center_lon), format="%.5f", key=f"q_lon_{selected_region}")
+        mode = q3.radio("검색 방식", ["반경 안 필지", "반경 안 최저가 K개", "사각 영역 안 필지"])
+
+        started = time.perf_counter()
+        if mode == "사각 영역 안 필지":
+            w1, w2 = st.columns(2)
+            width_m = w1.slider("가로 (m)", 100, 10000, 2000, step=100)
+            height_m = w2.slider("세로 (m)", 100, 10000, 2000, step=100)
+            d_lat = np.degrees(height_m / 2 / EARTH_RADIUS_M)
+            d_lon = np.degrees(width_m / 2 / EARTH_RADIUS_M) / np.cos(np.radians(q_lat))
+            found = query_bbox(grid, q_lat - d_lat, q_lat + d_lat, q_lon - d_lon, q_lon + d_lon)
+            dist = haversine_m(
+                q_lat, q_lon,
+                df[lat_col].to_numpy(dtype="float64")[found],
+                df[lon_col].to_numpy(dtype="float64")[found],
+            )
+        else:
+            w1, w2 = st.columns(2)
+            radius_m = w1.slider("반경 (m)", 100, 5000, 1000, step=100)
+            if mode == "반경 안 필지":
+                found, dist = query_radius(grid, q_lat, q_lon, radius_m)
+            else:
+                k = w2.number_input("K", min_value=1, max_value=1000, value=10)
+                found, dist = cheapest_near(grid, q_lat, q_lon, radius_m, int(k))
+        elapsed_ms = (time.perf_counter() - started) * 1000
 
-        st.plotly_chart(fig_map, use_container_width=True)
+        st.caption(f"검색 결과 {len(found):,}필지 · {elapsed_ms:.1f} ms")
+        if len(found):
+            result = df.iloc[found].assign(**{"거리(m)": np.round(dist).astype("int64")})
+            st.dataframe(result.head(POINT_LIMIT), hide_index=True, use_container_width=True)
+            shown = result.head(POINT_LIMIT)
+            fig_near = map_figure("points", shown, max(zoom, 13), q_lat, q_lon, price_col, lat_col, lon_col)
+            st.plotly_chart(fig_near, use_container_width=True, key="near_map")
 
     else:
         st.error("⚠️ 지역 또는 땅값 관련 컬럼을 찾을 수 없습니다.")
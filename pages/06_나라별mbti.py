@@ -1,32 +1,174 @@
+import os
+
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 
+from ranked_bar import ranked_bar_chart
+
 st.set_page_config(page_title="국가별 MBTI 분석", page_icon="🌍", layout="wide")
 
 st.title("🌍 국가별 MBTI 비율 시각화")
 st.write("국가를 선택하면 해당 국가의 MBTI 비율을 막대 그래프로 확인할 수 있습니다.")
 
-# CSV load (루트 폴더 위치 기준)
+# CSV 경로 (루트 폴더 위치 기준)
+DATA_CSV = "countriesMBTI_16types.csv"
+
+# 비슷한 나라 목록 길이 / 군집 수 선택 범위
+NEIGHBORS = 10
+K_RANGE = range(2, 9)
+
+# 4개 지표 (첫 글자 쪽 비율을 계산, 나머지는 1 - 비율)
+AXES = (("E", "I"), ("S", "N"), ("T", "F"), ("J", "P"))
+
+
+# CSV load (파일이 바뀌면 mtime이 달라져서 다시 읽음)
 @st.cache_data
-def load_data():
-    df = pd.read_csv("countriesMBTI_16types.csv")
+def load_data(path, mtime_ns):
+    df = pd.read_csv(path)
     return df
 
-df = load_data()
 
-# 국가 목록 가져오기
-countries = df["Country"].dropna().unique().tolist()
+@st.cache_resource(show_spinner=False)
+def load_matrix(path, mtime_ns):
+    """
+    국가 × 16유형 비율을 float32 행렬로 한 번만 만들고,
+    유사도/이웃 목록도 여기서 같이 계산해 둡니다 (행렬곱 한 번).
+
+    반환값:
+      countries, types, X      국가 이름 / 유형 이름 / 비율 행렬
+      index                    국가 이름 → 행 번호
+      Z                        유형별로 표준화한 뒤 행 단위로 정규화한 행렬 (코사인 유사도용)
+      sim, neighbors           국가 × 국가 유사도, 유사도 순 이웃 행 번호 (자기 자신 제외)
+      P, axes                  16유형 → 4지표 투영 행렬 (16 × 4), 국가 × 4지표 비율 (E, S, T, J 쪽)
+    """
+    df = load_data(path, mtime_ns).dropna(subset=["Country"]).drop_duplicates("Country")
+    types = [c for c in df.columns if c != "Country"]
+    countries = df["Country"].to_numpy(dtype=object)
+    X = df[types].to_numpy(dtype="float32")
+
+    # 모든 나라에 공통인 유형 편차를 빼야 '어떤 유형이 유난히 많은지'로 비교됨
+    Z = (X - X.mean(axis=0)) / (X.std(axis=0) + 1e-9)
+    Z /= np.linalg.norm(Z, axis=1, keepdims=True) + 1e-9
+
+    # 유형 이름의 k번째 글자가 지표의 첫 글자면 1 → 국가 전체에 행렬곱 한 번
+    P = np.array([[t[k] == axis[0] for k, axis in enumerate(AXES)] for t in types], dtype="float32")
+    axes = (X @ P) / X.sum(axis=1, keepdims=True)
+
+    sim = Z @ Z.T
+    np.fill_diagonal(sim, -np.inf)
+    neighbors = np.argsort(-sim, axis=1, kind="stable")[:, :NEIGHBORS]
+    np.fill_diagonal(sim, 1.0)
+
+    return {
+        "countries": countries,
+        "types": types,
+        "X": X,
+        "index": {name: i for i, name in enumerate(countries)},
+        "Z": Z,
+        "sim": sim,
+        "neighbors": neighbors,
+        "P": P,
+        "axes": axes,
+    }
+
+
+def kmeans(Z, k, n_init=10, n_iter=100, seed=0):
+    """k-means++ 초기화 + Lloyd 반복 (numpy). 가장 관성이 작은 결과를 씀"""
+    rng = np.random.default_rng(seed)
+    sq = (Z ** 2).sum(axis=1)
+    best = None
+    for _ in range(n_init):
+        centers = [Z[rng.integers(len(Z))]]
+        for _ in range(1, k):
+            d = ((Z[:, None, :] - np.array(centers)[None]) ** 2).sum(axis=2).min(axis=1)
+            centers.append(Z[rng.choice(len(Z), p=d / d.sum())])
+        centers = np.array(centers)
+
+        for _ in range(n_iter):
+            # 거리² = |z|² - 2 z·c + |c|² (행렬곱 한 번)
+            dist = sq[:, None] - 2 * Z @ centers.T + (centers ** 2).sum(axis=1)[None, :]
+            labels = dist.argmin(axis=1)
+            new = np.array([Z[labels == j].mean(axis=0) if (labels == j).any() else centers[j] for j in range(k)])
+            if np.allclose(new, centers):
+                break
+            centers = new
+        inertia = dist[np.arange(len(Z)), labels].sum()
+        if best is None or inertia < best[0]:
+            best = (inertia, labels)
+    return best[1]
+
+
+@st.cache_resource(show_spinner=False)
+def cluster_countries(path, mtime_ns, k):
+    """
+    파일 버전 × k 마다 한 번만 군집화합니다.
+    군집 번호는 군집 크기 순으로 다시 매기고, 2차원 좌표(PCA)도 같이 돌려줍니다.
+    """
+    mat = load_matrix(path, mtime_ns)
+    labels = kmeans(mat["Z"], k)
+    order = np.argsort(-np.bincount(labels, minlength=k), kind="stable")
+    labels = np.argsort(order)[labels]
+
+    centered = mat["Z"] - mat["Z"].mean(axis=0)
+    _, _, vt = np.linalg.svd(centered, full_matrices=False)
+    coords = centered @ vt[:2].T
+
+    # 군집별 평균 비율 (유형 × 군집)
+    profile = np.stack([mat["X"][labels == j].mean(axis=0) for j in range(k)])
+    return labels, coords, profile
 
-# 국가 선택 UI
-selected_country = st.selectbox("국가를 선택하세요", countries)
 
-# 선택한 국가의 데이터 추출
-row = df[df["Country"] == selected_country].iloc[0]
+@st.cache_data(show_spinner=False, max_entries=64)
+def comparison_figures(path, mtime_ns, selected):
+    """
+    선택한 나라들의 행렬 구간만 잘라서 (16유형 히트맵, 4지표 히트맵)을 만듭니다.
+    같은 선택 조합이면 캐시된 그림을 그대로 씁니다.
+    """
+    mat = load_matrix(path, mtime_ns)
+    rows = [mat["index"][name] for name in selected]
+    show_text = len(rows) <= 20
+    height = max(300, 28 * len(rows) + 120)
 
-# MBTI 열 추출 (Country 제외)
-mbti_cols = [c for c in df.columns if c != "Country"]
-mbti_values = row[mbti_cols].values
+    fig_types = px.imshow(
+        mat["X"][rows],
+        x=mat["types"], y=list(selected),
+        color_continuous_scale="Blues", aspect="auto",
+        text_auto=".2f" if show_text else False,
+        labels=dict(color="비율"),
+    )
+    fig_types.update_layout(height=height, margin=dict(l=10, r=10, t=30, b=10))
+
+    # 4지표: 50%와의 차이 (양수면 앞 글자 쪽, 음수면 뒤 글자 쪽)
+    lean = mat["axes"][rows] - 0.5
+    limit = float(np.abs(mat["axes"] - 0.5).max())
+    fig_axes = px.imshow(
+        lean,
+        x=[f"{a} ↔ {b}" for a, b in AXES], y=list(selected),
+        color_continuous_scale="RdBu", zmin=-limit, zmax=limit, aspect="auto",
+        labels=dict(color="50% 대비"),
+    )
+    fig_axes.update_traces(
+        text=[[f"{a} {v:.0%}" if v >= 0.5 else f"{b} {1 - v:.0%}" for v, (a, b) in zip(row, AXES)]
+              for row in mat["axes"][rows]],
+        texttemplate="%{text}" if show_text else None,
+        hovertemplate="%{y}<br>%{text}<extra></extra>",
+    )
+    fig_axes.update_layout(height=height, margin=dict(l=10, r=10, t=30, b=10))
+    return fig_types, fig_axes
+
+
+data_mtime = os.stat(DATA_CSV).st_mtime_ns
+mat = load_matrix(DATA_CSV, data_mtime)
+
+# 국가 선택 UI
+selected_country = st.selectbox("국가를 선택하세요", mat["countries"].tolist())
+
+# 선택한 국가의 데이터 추출 (행 번호 lookup)
+i = mat["index"][selected_country]
+mbti_cols = mat["types"]
+mbti_values = mat["X"][i]
 
 # 데이터프레임 생성
 chart_df = pd.DataFrame({
@@ -34,18 +176,8 @@ chart_df = pd.DataFrame({
     "Value": mbti_values
 }).sort_values("Value", ascending=False)
 
-# 색상 설정: 1등(최댓값)은 빨간색, 나머지는 그라데이션
-colors = ["red"] + [f"rgba(0,{50 + i*10},255,{0.9 - i*0.03})" for i in range(len(chart_df)-1)]
-
-# plotly 그래프 생성
-fig = px.bar(
-    chart_df,
-    x="MBTI",
-    y="Value",
-)
-
-# 바 색 적용
-fig.update_traces(marker_color=colors)
+# plotly 그래프 생성 (1등(최댓값)은 빨간색, 나머지는 그라데이션)
+fig = ranked_bar_chart(chart_df, "MBTI", "Value", value_format=".3f")
 
 # 그래프 스타일 조정
 fig.update_layout(
@@ -61,3 +193,74 @@ st.plotly_chart(fig, use_container_width=True)
 # 데이터 테이블도 표시 (옵션)
 with st.expander("📄 데이터 값 보기"):
     st.dataframe(chart_df.reset_index(drop=True))
+
+# ---------------------------
+# 비슷한 나라 / 군집
+# ---------------------------
+st.markdown("---")
+left, right = st.columns([1, 2])
+
+with left:
+    st.subheader(f"🤝 {selected_country}와 비슷한 나라")
+    near = mat["neighbors"][i]
+    st.dataframe(
+        pd.DataFrame({
+            "순위": np.arange(1, len(near) + 1),
+            "국가": mat["countries"][near],
+            "유사도": mat["sim"][i, near].round(3),
+        }),
+        hide_index=True,
+        use_container_width=True,
+    )
+    st.caption("유형별로 표준화한 비율의 코사인 유사도입니다.")
+
+with right:
+    st.subheader("🧩 MBTI 분포가 비슷한 나라끼리 묶기")
+    k = st.slider("군집 수", K_RANGE.start, K_RANGE.stop - 1, 5)
+    labels, coords, profile = cluster_countries(DATA_CSV, data_mtime, k)
+    my_cluster = labels[i]
+
+    scatter_df = pd.DataFrame({
+        "국가": mat["countries"],
+        "군집": [f"군집 {c + 1}" for c in labels],
+        "x": coords[:, 0],
+        "y": coords[:, 1],
+        "선택": np.where(np.arange(len(labels)) == i, 14, 6),
+    })
+    fig_cluster = px.scatter(
+        scatter_df, x="x", y="y", color="군집", hover_name="국가", size="선택",
+        category_orders={"군집": [f"군집 {c + 1}" for c in range(k)]},
+        template="simple_white", height=450,
+    )
+    fig_cluster.update_layout(xaxis_title="주성분 1", yaxis_title="주성분 2")
+    st.plotly_chart(fig_cluster, use_container_width=True)
+
+    members = mat["countries"][labels == my_cluster]
+    st.markdown(f"**{selected_country}** 는 **군집 {my_cluster + 1}** ({len(members)}개국)")
+    st.write(", ".join(members))
+    top_types = np.argsort(-(profile[my_cluster] - mat["X"].mean(axis=0)))[:3]
+    st.caption("전체 평균보다 특히 많은 유형: " + ", ".join(mbti_cols[t] for t in top_types))
+
+# ---------------------------
+# 여러 나라 비교 (16유형 / 4지표)
+# ---------------------------
+st.markdown("---")
+st.subheader("🌐 여러 나라 비교")
+
+compare = st.multiselect(
+    "비교할 나라를 고르세요",
+    mat["countries"].tolist(),
+    default=[selected_country] + mat["countries"][mat["neighbors"][i][:4]].tolist(),
+)
+
+if compare:
+    fig_types, fig_axes = comparison_figures(DATA_CSV, data_mtime, tuple(compare))
+    c1, c2 = st.columns([3, 2])
+    with c1:
+        st.markdown("**16유형 비율**")
+        st.plotly_chart(fig_types, use_container_width=True)
+    with c2:
+        st.markdown("**4지표 (E/I · S/N · T/F · J/P)**")
+        st.plotly_chart(fig_axes, use_container_width=True)
+else:
+    st.info("나라를 하나 이상 고르면 비교표가 나타납니다.")
@@ -1,15 +1,20 @@
+import glob
+import os
+import re
+
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
 import plotly.express as px
-import plotly.colors as pcolors
 import numpy as np
 
+from ranked_bar import ranked_bar_chart
+
 # --- 1. 데이터 로드 및 전처리 ---
 @st.cache_data
-def load_data(file_path):
+def load_data(file_path, mtime_ns):
     """
     CSV 파일을 로드하고 전처리합니다.
+    (mtime_ns는 캐시 키 — 파일이 바뀌면 다시 읽음)
     """
     try:
         # 'cp949' 인코딩으로 원본 파일 로드
@@ -45,216 +50,581 @@ def load_data(file_path):
         pass
 
     major_crimes = sorted(df_cleaned['범죄대분류'].unique().tolist())
-        
+
     return df_cleaned, region_cols, major_crimes
 
-# --- 공통 함수: 커스텀 바 차트 ---
-def draw_bar_chart(df_plot, x_col, y_col, title, hover_data=None, color_col=None):
-    df_sorted = df_plot.sort_values(by=x_col, ascending=True)
-    num_items = len(df_sorted)
-    
-    # 색상 로직
-    if color_col:
-        # 별도 컬러 컬럼이 있으면 Plotly Express 기본 색상 사용 (비교 차트용)
-        marker_settings = {}
-    else:
-        # 그라데이션 + 1등 강조 로직
-        color_scale_values = [i / (num_items * 1.25) for i in range(num_items)]
-        try:
-            gradient_colors = pcolors.sample_colorscale('Blues', color_scale_values)
-        except:
-            from plotly.colors import colorscale_to_colors
-            gradient_colors = colorscale_to_colors(pcolors.sequential.Blues, color_scale_values)
-        if gradient_colors:
-            gradient_colors[-1] = 'red'
-        marker_settings = dict(color=gradient_colors, line=dict(color='rgba(0,0,0,0.5)', width=1))
-
-    fig = go.Figure(go.Bar(
-        x=df_sorted[x_col],
-        y=df_sorted[y_col],
-        orientation='h',
-        marker=marker_settings,
-        customdata=df_sorted[hover_data] if hover_data else None,
-        hovertemplate='<b>%{y}</b><br>' + '건수: %{x:,.0f}<br>' + (f'{hover_data}: %{{customdata}}<br>' if hover_data else '') + '<extra></extra>'
-    ))
+# --- 1-1. 범죄 × 지역 행렬 (모든 탭이 공유) ---
+# 지역 컬럼 이름의 앞부분이 시도 (긴 것부터 비교: '경기도광주시'가 '광주'로 잘리지 않도록)
+REGION_PREFIXES = sorted([
+    '서울', '부산', '대구', '인천', '광주', '대전', '울산', '세종',
+    '경기도', '강원도', '강원특별자치도', '충북', '충남', '전북', '전북특별자치도',
+    '전남', '경북', '경남', '제주', '제주특별자치도', '외국',
+], key=len, reverse=True)
+
+def split_region(name):
+    """
+    '서울종로구' → ('서울', '종로구'), '경기도수원시' → ('경기도', '수원시'),
+    '외국미국' → ('외국', '미국'), '세종시' → ('세종', '세종시')
+    """
+    for prefix in REGION_PREFIXES:
+        if name.startswith(prefix) and len(name) > len(prefix):
+            rest = name[len(prefix):]
+            return prefix, (name if rest == '시' else rest)
+    return name, name
+
+def summarize_regions(values, labels, major_codes, n_major):
+    """
+    (중분류, 지역) 행렬 하나에 대한 지역 단위 뷰를 만듭니다.
+    시도 / 시군구 단위가 같은 모양이라 탭은 단위와 상관없이 같은 코드로 그립니다.
+    """
+    totals = values.sum(axis=0, dtype=np.int64)
+
+    # 대분류별 합계: 행(중분류)을 대분류 코드로 묶어서 한 번에 더함
+    major_sums = np.zeros((n_major, values.shape[1]), dtype=np.int32)
+    np.add.at(major_sums, major_codes, values)
+
+    # 지역 간 유사도: 중분류 구성비 프로필 → 범죄별 표준화 → L2 정규화 → 코사인 (행렬곱 한 번)
+    # (구성비라서 인구 규모 차이는 빠지고, 표준화해서 절도/사기 같은 대형 범죄가 유사도를 독점하지 않게 함)
+    shares = values.T / np.maximum(totals, 1)[:, None]
+    shares = (shares - shares.mean(axis=0)) / np.where(shares.std(axis=0) > 0, shares.std(axis=0), 1)
+    norms = np.linalg.norm(shares, axis=1, keepdims=True)
+    profiles = shares / np.where(norms > 0, norms, 1)
+
+    return {
+        'labels': np.array(labels, dtype=object),
+        'index': {r: j for j, r in enumerate(labels)},
+        'values': values,                                          # (중분류, 지역)
+        'totals': totals,
+        'major_sums': major_sums,                                  # (대분류, 지역)
+        'similarity': (profiles @ profiles.T).astype(np.float32),  # (지역, 지역) 코사인 유사도
+    }
+
+@st.cache_resource
+def build_crime_matrix(file_path, mtime_ns):
+    """
+    load_data 결과를 범죄(중분류) × 지역 int32 행렬로 한 번만 변환합니다.
+    지역 이름에서 시도 → 시군구 계층을 파싱해 시도 단위 합계도 여기서 미리 만들어 둡니다.
+    각 탭은 melt/pivot/groupby 없이 이 행렬들의 슬라이스와 합계만 사용합니다.
+    """
+    df_cleaned, region_cols, major_crimes = load_data(file_path, mtime_ns)
+
+    values = df_cleaned[region_cols].to_numpy(dtype=np.int32)
+    majors = df_cleaned['범죄대분류'].to_numpy(dtype=object)
+    subs = df_cleaned['범죄중분류'].to_numpy(dtype=object)
+    major_codes = np.searchsorted(np.array(major_crimes, dtype=object), majors)
+    major_rows = {m: np.flatnonzero(major_codes == k) for k, m in enumerate(major_crimes)}
+
+    # 시도 단위 롤업: (시군구, 시도) one-hot 행렬곱 한 번
+    parents = [split_region(r)[0] for r in region_cols]
+    top_labels = list(dict.fromkeys(parents))   # 원본 컬럼 순서 (서울, 부산, ..., 외국)
+    parent_codes = np.array([top_labels.index(p) for p in parents])
+    onehot = (parent_codes[:, None] == np.arange(len(top_labels))[None, :]).astype(np.int32)
+    top_values = values @ onehot
+
+    return {
+        'values': values,                      # (중분류, 시군구)
+        'majors': majors,
+        'subs': subs,
+        'region_cols': region_cols,
+        'major_crimes': major_crimes,
+        'crime_index': {(m, s): i for i, (m, s) in enumerate(zip(majors, subs))},
+        'major_rows': major_rows,
+        'subs_by_major': {m: sorted(set(subs[rows])) for m, rows in major_rows.items()},
+        'top_labels': top_labels,
+        'children': {p: np.flatnonzero(parent_codes == k) for k, p in enumerate(top_labels)},
+        'levels': {
+            '시도': summarize_regions(top_values, top_labels, major_codes, len(major_crimes)),
+            '시군구': summarize_regions(values, region_cols, major_codes, len(major_crimes)),
+        },
+    }
+
+def top_rows(vec, rows, n):
+    """rows 중 vec 값이 0보다 큰 것을 내림차순으로 n개 (행 번호 배열)"""
+    rows = rows[vec[rows] > 0]
+    return rows[np.argsort(-vec[rows], kind='stable')][:n]
+
+ALL_SCOPE = '전국 (시도별)'
+
+def region_scope(mat, scope):
+    """전국이면 시도 단위 전체, 특정 시도면 그 시도의 시군구만 (단위 뷰, 열 번호 배열)"""
+    if scope == ALL_SCOPE:
+        level = mat['levels']['시도']
+        return level, np.arange(len(level['labels']))
+    return mat['levels']['시군구'], mat['children'][scope]
+
+def select_region(label, key, mat=None):
+    """시도를 먼저 고르고, 필요하면 시군구로 드릴다운. 반환: (단위 뷰, 지역 이름)"""
+    mat = crime_mat if mat is None else mat
+    top = st.selectbox(f"{label} · 시도", mat['top_labels'], key=f'{key}_top')
+    sigungu = mat['levels']['시군구']
+    children = sigungu['labels'][mat['children'][top]].tolist()
+    if len(children) > 1:
+        sub = st.selectbox(f"{label} · 시군구", ['전체'] + children, key=f'{key}_sub')
+        if sub != '전체':
+            return sigungu, sub
+    return mat['levels']['시도'], top
+
+# --- 1-2. 연도별 파일 → (연도, 중분류, 지역) 큐브 ---
+# crime_2023.csv, crime_2024.csv 처럼 연도별 파일을 같은 위치에 두면 함께 불러옵니다.
+# 연도별 파일이 없으면 기존처럼 crime.csv 하나만 사용합니다.
+# 반환값: ((연도, 경로, mtime_ns), ...) — mtime_ns가 캐시 키라서 파일을 바꾸면 다시 계산됩니다.
+def file_version(path):
+    return os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+
+def find_crime_files(default_path='crime.csv'):
+    files = []
+    for path in sorted(glob.glob('crime_*.csv')):
+        m = re.fullmatch(r'crime_(\d{4})\.csv', os.path.basename(path))
+        if m:
+            files.append((m.group(1), path, file_version(path)))
+    return tuple(files) if files else (('현재', default_path, file_version(default_path)),)
+
+def rank_desc(a):
+    """마지막 축 기준 내림차순 순위 (1등 = 가장 많음)"""
+    return np.argsort(np.argsort(-a, axis=-1, kind='stable'), axis=-1) + 1
+
+def cube_level(labels, cube, major_cube, present):
+    """(연도, 범죄, 지역) 큐브 하나에 대한 지역 단위 뷰 (합계 / 순위는 여기서 한 번에)"""
+    totals = cube.sum(axis=1, dtype=np.int64)       # (연도, 지역)
+    return {
+        'labels': np.array(labels, dtype=object),
+        'index': {r: j for j, r in enumerate(labels)},
+        'cube': cube,                               # (연도, 중분류, 지역)
+        'major_cube': major_cube,                   # (연도, 대분류, 지역)
+        'totals': totals,
+        'present': present,                         # (연도, 지역)
+        'ranks': rank_desc(cube),
+        'major_ranks': rank_desc(major_cube),
+        'total_ranks': rank_desc(totals),
+    }
 
+@st.cache_resource
+def build_crime_cube(crime_files):
+    """
+    연도별 행렬을 (연도, 중분류, 지역) int32 큐브로 쌓습니다.
+    연도마다 지역/범죄 구성이 달라도 라벨 기준으로 정렬하고, 없는 칸은 0 + present 마스크(지역 / 범죄)로 표시합니다.
+    대분류 합계와 연도별 순위, 시도 단위 롤업도 여기서 한 번에 계산해 둡니다.
+    """
+    years = [year for year, _, _ in crime_files]
+    mats = [build_crime_matrix(path, mtime_ns) for _, path, mtime_ns in crime_files]
+
+    # 라벨 합집합 (최신 연도의 순서를 우선)
+    region_labels = list(dict.fromkeys(r for m in reversed(mats) for r in m['region_cols']))
+    crime_labels = list(dict.fromkeys(k for m in reversed(mats) for k in m['crime_index']))
+    region_index = {r: j for j, r in enumerate(region_labels)}
+    crime_index = {k: i for i, k in enumerate(crime_labels)}
+
+    cube = np.zeros((len(years), len(crime_labels), len(region_labels)), dtype=np.int32)
+    region_present = np.zeros((len(years), len(region_labels)), dtype=bool)
+    crime_present = np.zeros((len(years), len(crime_labels)), dtype=bool)
+    for y, m in enumerate(mats):
+        rows = np.array([crime_index[k] for k in m['crime_index']])
+        cols = np.array([region_index[r] for r in m['region_cols']])
+        cube[y][np.ix_(rows, cols)] = m['values']
+        region_present[y, cols] = True
+        crime_present[y, rows] = True
+
+    # 대분류 합계: (대분류, 중분류) one-hot 행렬곱 한 번
+    major_labels = sorted({major for major, _ in crime_labels})
+    major_codes = np.searchsorted(np.array(major_labels, dtype=object), np.array([k[0] for k in crime_labels], dtype=object))
+    onehot = (major_codes[None, :] == np.arange(len(major_labels))[:, None]).astype(np.int32)
+    major_cube = onehot @ cube                      # (연도, 대분류, 지역)
+    major_present = (crime_present.astype(np.int32) @ onehot.T) > 0   # 중분류가 하나라도 있으면 그 대분류도 있음
+
+    # 시도 단위 롤업: (시군구, 시도) one-hot 행렬곱 한 번 (build_crime_matrix와 같은 방식)
+    parents = [split_region(r)[0] for r in region_labels]
+    top_labels = list(dict.fromkeys(parents))
+    parent_codes = np.array([top_labels.index(p) for p in parents])
+    region_onehot = (parent_codes[:, None] == np.arange(len(top_labels))[None, :]).astype(np.int32)
+    top_present = (region_present.astype(np.int32) @ region_onehot) > 0
+
+    return {
+        'years': years,
+        'crime_labels': crime_labels,
+        'major_labels': major_labels,
+        'crime_index': crime_index,
+        'crime_present': crime_present,     # (연도, 중분류)
+        'major_present': major_present,     # (연도, 대분류)
+        'top_labels': top_labels,
+        'children': {p: np.flatnonzero(parent_codes == k) for k, p in enumerate(top_labels)},
+        'levels': {
+            '시도': cube_level(top_labels, cube @ region_onehot, major_cube @ region_onehot, top_present),
+            '시군구': cube_level(region_labels, cube, major_cube, region_present),
+        },
+    }
+
+def yoy_frame(labels, a, b, rank_a, rank_b, present_a, present_b):
+    """두 연도 값 벡터 → 증감 / 증감률 / 순위 변동 표 (모두 벡터 연산)"""
+    a = np.where(present_a, a, np.nan)
+    b = np.where(present_b, b, np.nan)
+    change = b - a
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = np.where(a > 0, change / a * 100, np.nan)
+    return pd.DataFrame({
+        '이름': labels,
+        '이전': a,
+        '이후': b,
+        '증감': change,
+        '증감률(%)': np.round(growth, 1),
+        '이전 순위': np.where(present_a, rank_a, np.nan),
+        '이후 순위': np.where(present_b, rank_b, np.nan),
+        '순위 변동': np.where(present_a & present_b, rank_a - rank_b, np.nan),
+    })
+
+# --- 1-3. 군집 순서로 정렬한 히트맵 (데이터 버전별 캐시) ---
+def cluster_order(x):
+    """
+    행들을 평균 연결(average linkage) 계층 군집으로 묶고 덴드로그램의 잎 순서를 반환합니다.
+    비슷한 패턴의 행이 서로 붙어서 나오도록 히트맵 행/열 순서로 사용합니다.
+    (scipy 없이 numpy만 사용 — 시군구 ~250개 규모라 병합마다 전체 거리 행렬을 훑어도 충분히 빠름)
+    """
+    n = len(x)
+    if n <= 2:
+        return np.arange(n)
+
+    # 유클리드 거리 행렬 (대각선은 inf로 두어 자기 자신과는 병합하지 않음)
+    sq = (x ** 2).sum(axis=1)
+    dist = np.sqrt(np.maximum(sq[:, None] + sq[None, :] - 2 * x @ x.T, 0))
+    np.fill_diagonal(dist, np.inf)
+
+    leaves = [[i] for i in range(n)]
+    sizes = np.ones(n)
+    for _ in range(n - 1):
+        a, b = np.unravel_index(np.argmin(dist), dist.shape)
+        a, b = min(a, b), max(a, b)
+        # 평균 연결: 새 군집과 다른 군집의 거리 = 크기 가중 평균
+        merged = (sizes[a] * dist[a] + sizes[b] * dist[b]) / (sizes[a] + sizes[b])
+        dist[a, :] = merged
+        dist[:, a] = merged
+        dist[a, a] = np.inf
+        dist[b, :] = np.inf
+        dist[:, b] = np.inf
+        leaves[a] = leaves[a] + leaves[b]
+        sizes[a] += sizes[b]
+    return np.array(leaves[a])
+
+@st.cache_resource
+def build_heatmap(file_path, mtime_ns, scope):
+    """
+    범위(전국 시도 / 특정 시도의 시군구)별 대분류 히트맵을 한 번만 만들어 둡니다.
+    행(지역)은 대분류 구성비, 열(대분류)은 지역별 분포가 비슷한 것끼리 군집 순서로 정렬합니다.
+    데이터 파일(경로 + 수정 시각)이 같으면 탭은 캐시된 Figure를 그대로 그립니다.
+    """
+    mat = build_crime_matrix(file_path, mtime_ns)
+    level, cols = region_scope(mat, scope)
+    z = level['major_sums'].T[cols].astype(np.float64)     # (지역, 대분류)
+
+    # 규모가 아니라 구성(패턴)으로 묶기 위해 행/열을 각각 비율로 정규화
+    row_profiles = z / np.maximum(z.sum(axis=1, keepdims=True), 1)
+    col_profiles = (z / np.maximum(z.sum(axis=0, keepdims=True), 1)).T
+    row_order = cluster_order(row_profiles)
+    col_order = cluster_order(col_profiles)
+
+    fig_heat = px.imshow(
+        z[np.ix_(row_order, col_order)],
+        labels=dict(x="범죄 유형", y="지역", color="발생 건수"),
+        x=np.array(mat['major_crimes'], dtype=object)[col_order].tolist(),
+        y=level['labels'][cols][row_order].tolist(),
+        aspect="auto",
+        color_continuous_scale="Reds" # 붉은색 계열
+    )
+    fig_heat.update_layout(height=700)
+    return fig_heat
+
+# --- 공통 함수: 커스텀 바 차트 (1등 빨강 + 그라데이션은 ranked_bar 공통 모듈) ---
+def draw_bar_chart(df_plot, x_col, y_col, title, hover_data=None):
+    # 제목은 ranked_bar_chart에 넘겨야 잘린 경우 '(상위 N개 / 전체 M개)'가 붙음
+    fig = ranked_bar_chart(df_plot, y_col, x_col, title=f"<b>{title}</b>", orientation='h', hover_col=hover_data)
     fig.update_layout(
-        title=dict(text=f"<b>{title}</b>", font=dict(size=18), x=0.5),
+        title=dict(font=dict(size=18), x=0.5),
         xaxis_title='발생 건수',
         yaxis_title=None,
-        height=max(500, num_items * 25),
+        height=max(500, len(fig.data[0].y) * 25),
         margin=dict(l=10, r=10, t=40, b=20),
         plot_bgcolor='rgba(0,0,0,0)',
         paper_bgcolor='rgba(0,0,0,0)'
     )
     return fig
 
+# --- 탭별 화면 (fragment) ---
+# ==========================================
+# TAB 1: 지역별 상세 분석 (기존 기능 + 도넛 차트)
+# ==========================================
+@st.fragment
+def render_region_tab():
+    col_opt, col_main = st.columns([1, 3])
+    
+    with col_opt:
+        st.subheader("설정")
+        level, sel_region = select_region("지역 선택", 't1_region')
+        sel_major = st.selectbox("대분류 필터", ['전체'] + major_crimes, index=0)
+
+    with col_main:
+        # 데이터 준비: 선택 지역의 열 벡터
+        j = level['index'][sel_region]
+        region_vec = level['values'][:, j]
+
+        # 1. 상단: 주요 지표 및 도넛 차트
+        c1, c2 = st.columns([1, 2])
+        
+        with c1:
+            total = level['totals'][j]
+            st.metric(f"{sel_region} 총 범죄", f"{total:,.0f} 건")
+            
+            # 대분류별 비율 (도넛 차트) - 미리 계산된 대분류 합계 사용
+            fig_pie = px.pie(values=level['major_sums'][:, j], names=major_crimes, hole=0.4, title=f"{sel_region} 범죄 유형 비율")
+            fig_pie.update_layout(showlegend=False, margin=dict(t=40, b=0, l=0, r=0), height=250)
+            st.plotly_chart(fig_pie, use_container_width=True)
+
+        with c2:
+            # 2. 상세 랭킹 (바 차트)
+            if sel_major != '전체':
+                rows = crime_mat['major_rows'][sel_major]
+            else:
+                rows = np.arange(len(region_vec))
+            
+            top = top_rows(region_vec, rows, 15)
+            plot_df = pd.DataFrame({'범죄대분류': majors[top], '범죄중분류': subs[top], '건수': region_vec[top]})
+            
+            if plot_df.empty:
+                st.warning("표시할 데이터가 없습니다.")
+            else:
+                fig_bar = draw_bar_chart(plot_df, '건수', '범죄중분류', f"{sel_region} 상세 범죄 순위 (Top 15)", hover_data='범죄대분류')
+                st.plotly_chart(fig_bar, use_container_width=True)
+
+# ==========================================
+# TAB 2: 범죄별 랭킹 (기존 기능 강화)
+# ==========================================
+@st.fragment
+def render_crime_tab():
+    col_opt2, col_main2 = st.columns([1, 3])
+    with col_opt2:
+        st.subheader("설정")
+        major_cat = st.selectbox("대분류", major_crimes, key='t2_major')
+        # 선택된 대분류에 맞는 중분류만 (미리 계산된 목록)
+        filtered_subs = crime_mat['subs_by_major'][major_cat]
+        sub_cat = st.selectbox("상세 범죄명", filtered_subs, key='t2_sub')
+        # 기본은 시도 단위, 시도를 고르면 그 시도의 시군구로 펼침
+        scope = st.selectbox("범위", [ALL_SCOPE] + crime_mat['top_labels'], key='t2_scope')
+    
+    with col_main2:
+        # 데이터 추출: 해당 범죄의 행 벡터 (범위 안의 지역만)
+        i = crime_mat['crime_index'].get((major_cat, sub_cat))
+        
+        if i is not None:
+            level, cols = region_scope(crime_mat, scope)
+            crime_vec = level['values'][i, cols]
+            labels = level['labels'][cols]
+            scope_name = '전국' if scope == ALL_SCOPE else scope
+            
+            # 통계 지표
+            avg_cnt = crime_vec.mean()
+            k = int(crime_vec.argmax())
+            
+            m1, m2, m3 = st.columns(3)
+            m1.metric(f"{scope_name} 총 발생", f"{crime_vec.sum():,.0f} 건")
+            m2.metric("지역 평균 발생", f"{avg_cnt:,.1f} 건")
+            m3.metric("최다 발생 지역", f"{labels[k]} ({crime_vec[k]}건)")
+
+            # 랭킹 차트
+            top = top_rows(crime_vec, np.arange(len(crime_vec)), 17)
+            rank_df = pd.DataFrame({'지역': labels[top], '건수': crime_vec[top]})
+            fig_rank = draw_bar_chart(rank_df, '건수', '지역', f"'{sub_cat}' 지역별 발생 순위 ({scope_name})")
+            st.plotly_chart(fig_rank, use_container_width=True)
+        else:
+            st.error("데이터 없음")
+
+# ==========================================
+# TAB 3: 지역 1:1 비교 (신규 기능)
+# ==========================================
+@st.fragment
+def render_compare_tab():
+    st.subheader("⚔️ 두 지역 간 범죄 현황 비교")
+    c_sel1, c_sel2 = st.columns(2)
+    with c_sel1:
+        level, r1 = select_region("지역 A", 't3_region')
+
+    # 미리 계산된 유사도 행렬에서 지역 A의 행만 꺼내 정렬 (같은 단위, A 자신은 제외)
+    region_labels = level['labels']
+    sim = level['similarity'][level['index'][r1]]
+    by_sim = np.argsort(-sim, kind='stable')
+    by_sim = by_sim[region_labels[by_sim] != r1]
+
+    s1, s2 = st.columns(2)
+    with s1:
+        st.markdown(f"**🤝 {r1}와(과) 가장 비슷한 지역**")
+        st.dataframe(pd.DataFrame({'지역': region_labels[by_sim[:5]], '유사도': sim[by_sim[:5]].round(3)}), hide_index=True, use_container_width=True)
+    with s2:
+        st.markdown(f"**↔️ {r1}와(과) 가장 다른 지역**")
+        st.dataframe(pd.DataFrame({'지역': region_labels[by_sim[::-1][:5]], '유사도': sim[by_sim[::-1][:5]].round(3)}), hide_index=True, use_container_width=True)
+
+    with c_sel2:
+        # 지역 B는 유사도 순 목록에서 선택 (기본값: 가장 비슷한 지역)
+        r2 = st.selectbox(
+            "지역 B (유사도 순)", region_labels[by_sim].tolist(),
+            format_func=lambda r: f"{r} (유사도 {sim[level['index'][r]]:.2f})",
+        )
+
+    if r2 is None or r1 == r2:
+        st.warning("서로 다른 두 지역을 선택해주세요.")
+    else:
+        # 데이터 준비: 두 지역의 열 번호
+        j1, j2 = level['index'][r1], level['index'][r2]
+        values = level['values']
+        
+        # 총계 비교
+        total_r1 = level['totals'][j1]
+        total_r2 = level['totals'][j2]
+        
+        mc1, mc2 = st.columns(2)
+        mc1.metric(f"{r1} 총 범죄", f"{total_r1:,.0f}", delta=f"{total_r1 - total_r2:,.0f} (vs {r2})")
+        mc2.metric(f"{r2} 총 범죄", f"{total_r2:,.0f}", delta=f"{total_r2 - total_r1:,.0f} (vs {r1})")
+        
+        st.markdown("---")
+        
+        # Top 범죄 비교 차트 (Grouped Bar Chart)
+        # 지역 A 기준 Top 10 범죄를 뽑아서 B와 비교
+        top = np.argsort(-values[:, j1], kind='stable')[:10]
+        
+        # Plotly Express용 long 형태 (지역 A 10개 + 지역 B 10개)
+        melted = pd.DataFrame({
+            '범죄중분류': np.tile(subs[top], 2),
+            '지역': [r1] * len(top) + [r2] * len(top),
+            '건수': np.concatenate([values[top, j1], values[top, j2]]),
+        })
+        
+        fig_comp = px.bar(
+            melted, x='건수', y='범죄중분류', color='지역', barmode='group',
+            title=f"{r1} 기준 주요 범죄 Top 10 비교",
+            height=600, orientation='h'
+        )
+        # 내림차순 정렬 효과
+        fig_comp.update_layout(yaxis={'categoryorder':'total ascending'})
+        st.plotly_chart(fig_comp, use_container_width=True)
+
+# ==========================================
+# TAB 4: 히트맵 & 종합 통계 (신규 기능)
+# ==========================================
+@st.fragment
+def render_heatmap_tab():
+    st.subheader("🔥 전국 범죄 대분류 히트맵")
+    st.caption("지역별로 어떤 유형의 범죄가 집중되는지 색상의 진하기로 파악할 수 있습니다. 비슷한 패턴의 지역/범죄 유형끼리 붙어 있도록 정렬했습니다. 기본은 시도 단위이며, 시도를 고르면 시군구로 펼쳐집니다.")
+    scope = st.selectbox("범위", [ALL_SCOPE] + crime_mat['top_labels'], key='t4_scope')
+    
+    # 히트맵 그리기 (군집 순서 계산 + Figure 생성은 데이터 파일/범위별로 한 번만)
+    fig_heat = build_heatmap(crime_path, crime_mtime, scope)
+    st.plotly_chart(fig_heat, use_container_width=True)
+    
+    st.markdown("### 📝 전체 데이터 원본")
+    with st.expander("클릭하여 원본 데이터 펼치기"):
+        st.dataframe(df_cleaned, use_container_width=True)
+
+# ==========================================
+# TAB 5: 연도별 비교 (YoY)
+# ==========================================
+@st.fragment
+def render_yoy_tab():
+    st.subheader("📈 연도별 비교 (증감 / 증감률 / 순위 변동)")
+    years = crime_cube['years']
+    if len(years) < 2:
+        st.info("crime_2023.csv, crime_2024.csv 처럼 연도별 파일을 2개 이상 두면 연도별 비교를 볼 수 있습니다.")
+        return
+
+    c_y1, c_y2, c_lv, c_sc = st.columns(4)
+    with c_y1:
+        y1 = st.selectbox("이전 연도", years, index=len(years) - 2, key='yoy_y1')
+    with c_y2:
+        y2 = st.selectbox("이후 연도", years, index=len(years) - 1, key='yoy_y2')
+    with c_lv:
+        level = st.radio("범죄 단위", ['전체', '대분류', '중분류'], horizontal=True, key='yoy_level')
+    with c_sc:
+        # 기본은 시도 단위, 시도를 고르면 그 시도의 시군구로 펼침
+        scope = st.selectbox("범위", [ALL_SCOPE] + crime_cube['top_labels'], key='yoy_scope')
+    if y1 == y2:
+        st.warning("서로 다른 두 연도를 선택해주세요.")
+        return
+    a, b = years.index(y1), years.index(y2)
+    major_present = crime_cube['major_present']
+    region_level, cols = region_scope(crime_cube, scope)
+    present = region_level['present']
+
+    # 1. 선택한 범죄의 지역별 증감 (큐브에서 (연도, 지역) 슬라이스만 꺼냄)
+    # 그 해 파일에 없던 범죄는 0건이 아니라 '없음'으로 처리 (지역 마스크 × 범죄 마스크)
+    if level == '전체':
+        label, series, ranks = '전체 범죄', region_level['totals'], region_level['total_ranks']
+        crime_ok = np.ones(len(years), dtype=bool)
+    elif level == '대분류':
+        label = st.selectbox("대분류", crime_cube['major_labels'], key='yoy_major')
+        k = crime_cube['major_labels'].index(label)
+        series, ranks = region_level['major_cube'][:, k], region_level['major_ranks'][:, k]
+        crime_ok = major_present[:, k]
+    else:
+        key = st.selectbox("중분류", crime_cube['crime_labels'], format_func=lambda k: f"{k[0]} / {k[1]}", key='yoy_sub')
+        label = key[1]
+        i = crime_cube['crime_index'][key]
+        series, ranks = region_level['cube'][:, i], region_level['ranks'][:, i]
+        crime_ok = crime_cube['crime_present'][:, i]
+
+    region_yoy = yoy_frame(
+        region_level['labels'][cols], series[a, cols], series[b, cols], ranks[a, cols], ranks[b, cols],
+        present[a, cols] & crime_ok[a], present[b, cols] & crime_ok[b],
+    ).rename(columns={'이름': '지역'})
+
+    scope_name = '전국' if scope == ALL_SCOPE else scope
+    top_up = region_yoy[region_yoy['증감'] > 0].sort_values('증감', ascending=False).head(15)
+    if not top_up.empty:
+        fig_up = draw_bar_chart(top_up, '증감', '지역', f"'{label}' {y1} → {y2} 증가폭 상위 지역 ({scope_name})")
+        st.plotly_chart(fig_up, use_container_width=True)
+    st.dataframe(region_yoy, use_container_width=True, hide_index=True)
+
+    # 2. 한 지역의 대분류별 증감 (시도 → 시군구 드릴다운)
+    st.markdown("---")
+    st.markdown("**지역별 대분류 증감**")
+    sel_level, sel_region = select_region("지역", 'yoy_region', crime_cube)
+    j = sel_level['index'][sel_region]
+    major_cube, major_ranks, present = sel_level['major_cube'], sel_level['major_ranks'], sel_level['present']
+    category_yoy = yoy_frame(
+        crime_cube['major_labels'], major_cube[a, :, j], major_cube[b, :, j],
+        major_ranks[a, :, j], major_ranks[b, :, j],
+        present[a, j] & major_present[a], present[b, j] & major_present[b],
+    ).rename(columns={'이름': '대분류'})
+    st.caption("순위는 해당 대분류 안에서 같은 단위(시도 / 시군구)의 전국 지역 중 순위입니다.")
+    st.dataframe(category_yoy, use_container_width=True, hide_index=True)
+
 # --- 2. 스트림릿 앱 UI ---
 st.set_page_config(layout="wide", page_title="범죄 데이터 종합 분석")
 
 st.title("🚔 전국 범죄 데이터 종합 대시보드")
 st.markdown("---")
 
-df_cleaned, region_cols, major_crimes = load_data('crime.csv')
+crime_files = find_crime_files()
+if len(crime_files) > 1:
+    sel_year = st.selectbox("기준 연도", [year for year, _, _ in crime_files], index=len(crime_files) - 1)
+else:
+    sel_year = crime_files[0][0]
+crime_path, crime_mtime = {year: (path, mtime) for year, path, mtime in crime_files}[sel_year]
+
+df_cleaned, region_cols, major_crimes = load_data(crime_path, crime_mtime)
 
 if not df_cleaned.empty:
-    
+    crime_mat = build_crime_matrix(crime_path, crime_mtime)
+    crime_cube = build_crime_cube(crime_files)
+    majors, subs = crime_mat['majors'], crime_mat['subs']
+
     # 탭 구성
-    tab1, tab2, tab3, tab4 = st.tabs(["🏘️ 지역별 분석", "🔍 범죄별 분석", "⚔️ 지역 1:1 비교", "🔥 히트맵 & 통계"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["🏘️ 지역별 분석", "🔍 범죄별 분석", "⚔️ 지역 1:1 비교", "🔥 히트맵 & 통계", "📈 연도별 비교"])
 
-    # ==========================================
-    # TAB 1: 지역별 상세 분석 (기존 기능 + 도넛 차트)
-    # ==========================================
+    # 각 탭은 fragment라서 탭 안의 위젯을 바꾸면 그 탭만 다시 실행됩니다.
     with tab1:
-        col_opt, col_main = st.columns([1, 3])
-        
-        with col_opt:
-            st.subheader("설정")
-            sel_region = st.selectbox("지역 선택", region_cols, index=0)
-            sel_major = st.selectbox("대분류 필터", ['전체'] + major_crimes, index=0)
-
-        with col_main:
-            # 데이터 준비
-            region_df = df_cleaned[['범죄대분류', '범죄중분류', sel_region]].copy()
-            region_df = region_df.rename(columns={sel_region: '건수'})
-            
-            # 1. 상단: 주요 지표 및 도넛 차트
-            c1, c2 = st.columns([1, 2])
-            
-            with c1:
-                total = region_df['건수'].sum()
-                st.metric(f"{sel_region} 총 범죄", f"{total:,.0f} 건")
-                
-                # 대분류별 비율 (도넛 차트)
-                pie_df = region_df.groupby('범죄대분류')['건수'].sum().reset_index()
-                fig_pie = px.pie(pie_df, values='건수', names='범죄대분류', hole=0.4, title=f"{sel_region} 범죄 유형 비율")
-                fig_pie.update_layout(showlegend=False, margin=dict(t=40, b=0, l=0, r=0), height=250)
-                st.plotly_chart(fig_pie, use_container_width=True)
-
-            with c2:
-                # 2. 상세 랭킹 (바 차트)
-                if sel_major != '전체':
-                    region_df = region_df[region_df['범죄대분류'] == sel_major]
-                
-                plot_df = region_df[region_df['건수'] > 0].sort_values(by='건수', ascending=False).head(15)
-                
-                if plot_df.empty:
-                    st.warning("표시할 데이터가 없습니다.")
-                else:
-                    fig_bar = draw_bar_chart(plot_df, '건수', '범죄중분류', f"{sel_region} 상세 범죄 순위 (Top 15)", hover_data='범죄대분류')
-                    st.plotly_chart(fig_bar, use_container_width=True)
-
-    # ==========================================
-    # TAB 2: 범죄별 랭킹 (기존 기능 강화)
-    # ==========================================
+        render_region_tab()
     with tab2:
-        col_opt2, col_main2 = st.columns([1, 3])
-        with col_opt2:
-            st.subheader("설정")
-            major_cat = st.selectbox("대분류", major_crimes, key='t2_major')
-            # 선택된 대분류에 맞는 중분류만 필터링
-            filtered_subs = df_cleaned[df_cleaned['범죄대분류'] == major_cat]['범죄중분류'].unique()
-            sub_cat = st.selectbox("상세 범죄명", sorted(filtered_subs), key='t2_sub')
-        
-        with col_main2:
-            # 데이터 추출
-            target_row = df_cleaned[(df_cleaned['범죄대분류'] == major_cat) & (df_cleaned['범죄중분류'] == sub_cat)]
-            
-            if not target_row.empty:
-                crime_by_reg = target_row[region_cols].T.reset_index()
-                crime_by_reg.columns = ['지역', '건수']
-                
-                # 통계 지표
-                avg_cnt = crime_by_reg['건수'].mean()
-                max_reg = crime_by_reg.loc[crime_by_reg['건수'].idxmax()]
-                
-                m1, m2, m3 = st.columns(3)
-                m1.metric("전국 총 발생", f"{crime_by_reg['건수'].sum():,.0f} 건")
-                m2.metric("지역 평균 발생", f"{avg_cnt:,.1f} 건")
-                m3.metric("최다 발생 지역", f"{max_reg['지역']} ({max_reg['건수']}건)")
-
-                # 랭킹 차트
-                rank_df = crime_by_reg[crime_by_reg['건수'] > 0].sort_values(by='건수', ascending=False).head(17)
-                fig_rank = draw_bar_chart(rank_df, '건수', '지역', f"'{sub_cat}' 지역별 발생 순위")
-                st.plotly_chart(fig_rank, use_container_width=True)
-            else:
-                st.error("데이터 없음")
-
-    # ==========================================
-    # TAB 3: 지역 1:1 비교 (신규 기능)
-    # ==========================================
+        render_crime_tab()
     with tab3:
-        st.subheader("⚔️ 두 지역 간 범죄 현황 비교")
-        c_sel1, c_sel2 = st.columns(2)
-        with c_sel1:
-            r1 = st.selectbox("지역 A", region_cols, index=0)
-        with c_sel2:
-            # 지역 B는 지역 A와 다른 것을 기본값으로
-            default_idx = 1 if len(region_cols) > 1 else 0
-            r2 = st.selectbox("지역 B", region_cols, index=default_idx)
-
-        if r1 == r2:
-            st.warning("서로 다른 두 지역을 선택해주세요.")
-        else:
-            # 데이터 준비
-            comp_df = df_cleaned[['범죄대분류', '범죄중분류', r1, r2]].copy()
-            
-            # 총계 비교
-            total_r1 = comp_df[r1].sum()
-            total_r2 = comp_df[r2].sum()
-            
-            mc1, mc2 = st.columns(2)
-            mc1.metric(f"{r1} 총 범죄", f"{total_r1:,.0f}", delta=f"{total_r1 - total_r2:,.0f} (vs {r2})")
-            mc2.metric(f"{r2} 총 범죄", f"{total_r2:,.0f}", delta=f"{total_r2 - total_r1:,.0f} (vs {r1})")
-            
-            st.markdown("---")
-            
-            # Top 범죄 비교 차트 (Grouped Bar Chart)
-            # 지역 A 기준 Top 10 범죄를 뽑아서 B와 비교
-            top_crimes = comp_df.sort_values(by=r1, ascending=False).head(10)
-            
-            # Plotly Express로 변환하기 위해 Melting
-            melted = top_crimes.melt(id_vars=['범죄중분류'], value_vars=[r1, r2], var_name='지역', value_name='건수')
-            
-            fig_comp = px.bar(
-                melted, x='건수', y='범죄중분류', color='지역', barmode='group',
-                title=f"{r1} 기준 주요 범죄 Top 10 비교",
-                height=600, orientation='h'
-            )
-            # 내림차순 정렬 효과
-            fig_comp.update_layout(yaxis={'categoryorder':'total ascending'})
-            st.plotly_chart(fig_comp, use_container_width=True)
-
-    # ==========================================
-    # TAB 4: 히트맵 & 종합 통계 (신규 기능)
-    # ==========================================
+        render_compare_tab()
     with tab4:
-        st.subheader("🔥 전국 범죄 대분류 히트맵")
-        st.caption("지역별로 어떤 유형의 범죄가 집중되는지 색상의 진하기로 파악할 수 있습니다.")
-        
-        # 히트맵용 데이터 집계 (행: 지역, 열: 대분류, 값: 건수 합계)
-        # 1. Melt
-        heatmap_base = df_cleaned.melt(id_vars=['범죄대분류', '범죄중분류'], value_vars=region_cols, var_name='지역', value_name='건수')
-        # 2. Groupby
-        heatmap_data = heatmap_base.groupby(['지역', '범죄대분류'])['건수'].sum().reset_index()
-        # 3. Pivot
-        heatmap_pivot = heatmap_data.pivot(index='지역', columns='범죄대분류', values='건수')
-        
-        # 히트맵 그리기
-        fig_heat = px.imshow(
-            heatmap_pivot,
-            labels=dict(x="범죄 유형", y="지역", color="발생 건수"),
-            x=heatmap_pivot.columns,
-            y=heatmap_pivot.index,
-            aspect="auto",
-            color_continuous_scale="Reds" # 붉은색 계열
-        )
-        fig_heat.update_layout(height=700)
-        st.plotly_chart(fig_heat, use_container_width=True)
-        
-        st.markdown("### 📝 전체 데이터 원본")
-        with st.expander("클릭하여 원본 데이터 펼치기"):
-            st.dataframe(df_cleaned, use_container_width=True)
+        render_heatmap_tab()
+    with tab5:
+        render_yoy_tab()
 
 else:
     st.error("데이터를 로드할 수 없습니다.")
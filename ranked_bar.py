@@ -0,0 +1,75 @@
+"""
+여러 페이지가 같이 쓰는 '1등 빨강 + 나머지 파랑 그라데이션' 순위 막대 그래프.
+
+- 색상은 막대마다 문자열을 만들지 않고 0~1 값 배열 하나(NumPy 연산 한 번)로 계산해서
+  colorscale로 칠합니다. 1.0(1등)만 빨강이 되도록 colorscale 끝에 빨강을 붙였습니다.
+- 막대 수와 상관없이 trace는 항상 하나입니다.
+- 막대 그래프는 WebGL trace가 없으므로, 막대가 MAX_BARS개를 넘으면 상위 MAX_BARS개만 보냅니다.
+"""
+import numpy as np
+import plotly.colors as pcolors
+import plotly.graph_objects as go
+
+# 한 그래프에 보내는 최대 막대 수 (넘으면 상위만 남기고 제목에 표시)
+MAX_BARS = 50
+
+# 0 ~ 0.98: Blues, 1.0: 빨강 (1등 전용)
+_BLUES = pcolors.sequential.Blues
+RANKED_COLORSCALE = [[0.98 * i / (len(_BLUES) - 1), c] for i, c in enumerate(_BLUES)] + [[1.0, "red"]]
+
+
+def ranked_colors(values, color_by="rank"):
+    """
+    내림차순으로 정렬된 값 배열 → colorscale 위치(0~1) 배열.
+    1등은 1.0(빨강), 나머지는 순위(rank) 또는 값 크기(value)에 따라 진한 파랑 → 연한 파랑.
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if color_by == "value":
+        span = values.max() - values.min() if n else 0
+        scale = (values - values.min()) / span if span > 0 else np.ones(n)
+    else:
+        scale = 1 - (np.arange(n) - 1) / max(n - 2, 1)
+    return np.where(np.arange(n) == 0, 1.0, 0.15 + 0.7 * scale)
+
+
+def ranked_bar_chart(df, label_col, value_col, title=None, orientation="v",
+                     hover_col=None, color_by="rank", value_format=",.0f", max_bars=MAX_BARS):
+    """
+    df[value_col] 내림차순 순위 막대 그래프 (1등 빨강).
+    orientation="h"이면 1등이 맨 위에 오도록 y축을 뒤집습니다.
+    """
+    order = np.argsort(-df[value_col].to_numpy(), kind="stable")
+    total = len(order)
+    if total > max_bars:
+        order = order[:max_bars]
+        title = f"{title or ''} (상위 {max_bars}개 / 전체 {total:,}개)"
+
+    labels = df[label_col].to_numpy()[order]
+    values = df[value_col].to_numpy()[order]
+    hover = df[hover_col].to_numpy()[order] if hover_col else None
+
+    axis = "y" if orientation == "h" else "x"
+    value_axis = "x" if orientation == "h" else "y"
+    fig = go.Figure(go.Bar(
+        **{axis: labels, value_axis: values},
+        orientation=orientation,
+        marker=dict(
+            color=ranked_colors(values, color_by),
+            colorscale=RANKED_COLORSCALE,
+            cmin=0,
+            cmax=1,
+            line=dict(color="rgba(0,0,0,0.5)", width=1),
+        ),
+        customdata=hover,
+        hovertemplate=(
+            f"<b>%{{{axis}}}</b><br>{value_col}: %{{{value_axis}:{value_format}}}<br>"
+            + (f"{hover_col}: %{{customdata}}<br>" if hover_col else "")
+            + "<extra></extra>"
+        ),
+    ))
+
+    fig.update_layout(title=title, showlegend=False)
+    if orientation == "h":
+        fig.update_yaxes(autorange="reversed")
+    return fig